@@ -5,6 +5,7 @@ config.xml配置文件相关的Web API接口
 
 from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime
+from functools import wraps
 import logging
 import xml.etree.ElementTree as ET
 from typing import Dict, Any, List
@@ -29,6 +30,21 @@ def get_data_manager():
         raise RuntimeError("Data manager not initialized")
     return _data_manager
 
+
+def _config_write_locked(func):
+    """
+    修改并写回XML的接口：整个 修改root -> 写文件 过程持有 ConfigManager.lock，
+    与后台重新加载配置互斥，修改不会写到被替换掉的旧树上。
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if _data_manager is None:
+            # 由接口自身返回未初始化的错误
+            return func(*args, **kwargs)
+        with _data_manager.config_manager.lock:
+            return func(*args, **kwargs)
+    return wrapper
+
 # ===============================
 # 内部辅助函数 (请将这些函数添加到文件顶部，在路由之前)
 # ===============================
@@ -123,6 +139,7 @@ def get_xml_config():
 
 
 @config_bp.route('/config/xml/base', methods=['POST'])
+@_config_write_locked
 def update_base_config():
     """
     更新基础配置(当前模板ID、偏移量等)
@@ -238,6 +255,7 @@ def get_templates():
 
 
 @config_bp.route('/config/xml/templates/<template_id>', methods=['POST'])
+@_config_write_locked
 def update_template(template_id):
     """
     更新指定模板配置
@@ -335,6 +353,7 @@ def update_template(template_id):
 # 在你的 config_api.py 文件中
 
 @config_bp.route('/config/xml/templates/<template_id>', methods=['DELETE'])
+@_config_write_locked
 def delete_template(template_id):
     """
     删除指定模板
@@ -413,8 +432,8 @@ def reload_config():
     try:
         data_manager = get_data_manager()
 
-        # 重新加载配置文件
-        success = data_manager.config_manager.load_config()
+        # 显式请求总是重新解析文件并重新初始化所有配置（文件变化可能已被后台重新加载处理）
+        success = data_manager.reload_config(force=True)
         if not success:
             return jsonify({
                 'success': False,
@@ -422,9 +441,6 @@ def reload_config():
                 'data': None
             }), 500
 
-        # 重新初始化所有配置
-        data_manager._load_all_configs()
-
         return jsonify({
             'success': True,
             'message': '配置文件重新加载成功',
@@ -446,6 +462,7 @@ def reload_config():
 
 
 @config_bp.route('/config/xml/backup', methods=['POST'])
+@_config_write_locked
 def backup_config():
     """
     备份当前配置文件
@@ -536,6 +553,7 @@ def get_channels():
 
 
 @config_bp.route('/config/xml/channels/<channel_id>', methods=['POST'])
+@_config_write_locked
 def update_channel(channel_id):
     """
     更新或创建指定通道的配置
@@ -618,6 +636,7 @@ def update_channel(channel_id):
 
 
 @config_bp.route('/config/xml/channels/<channel_id>', methods=['DELETE'])
+@_config_write_locked
 def delete_channel(channel_id):
     """
     删除指定通道
@@ -4,6 +4,7 @@
 提供事件查询、统计和管理的RESTful API
 """
 
+from array import array
 from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime, date, timedelta
 import logging
@@ -34,6 +35,15 @@ def get_event_service_instance():
     return _event_service
 
 
+def _unpack_pulse_data(value: Optional[bytes]) -> Optional[List[float]]:
+    """脉冲时间戳BLOB（float64数组）-> 列表，供JSON序列化"""
+    if value is None:
+        return None
+    pulse_data = array('d')
+    pulse_data.frombytes(value)
+    return pulse_data.tolist()
+
+
 # ===============================
 # 事件查询接口
 # ===============================
@@ -304,7 +314,7 @@ def get_pulse_frequency_events():
                 'pulse_count': record.pulse_count,
                 'measurement_duration': record.measurement_duration,
                 'timestamp': record.timestamp.isoformat() if record.timestamp else None,
-                'pulse_data': record.pulse_data
+                'pulse_data': _unpack_pulse_data(record.pulse_data)
             })
 
         return jsonify({
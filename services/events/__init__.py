@@ -2,6 +2,8 @@
 事件监听系统入口模块
 """
 
+import threading
+
 from .models import (
     EventType, SortingType, CommunicationStatus,
     BaseEvent, SortingEvent, CommunicationStatusEvent, PulseFrequencyEvent,
@@ -15,6 +17,7 @@ from .service import EventService
 
 # 全局事件服务实例
 _event_service = None
+_event_service_lock = threading.Lock()
 
 
 def init_event_service(db_path: str = "events.db",
@@ -22,7 +25,13 @@ def init_event_service(db_path: str = "events.db",
                        use_optimized_storage: bool = True):
     """初始化全局事件服务实例"""
     global _event_service
-    if _event_service is None:
+    if _event_service is not None:
+        return _event_service
+
+    with _event_service_lock:
+        if _event_service is not None:
+            return _event_service
+
         # 根据参数选择存储实现
         if use_optimized_storage:
             # 使用优化版存储（批量提交）
@@ -38,15 +47,18 @@ def init_event_service(db_path: str = "events.db",
             data_store = OptimizedEventDataStore(db_path)
 
         # 创建事件服务实例
-        _event_service = EventService.__new__(EventService)
-        _event_service.data_store = data_store
-        _event_service.event_listener = EventListener(data_store)
+        event_service = EventService.__new__(EventService)
+        event_service.db_path = db_path
+        event_service.max_queue_size = 1000
+        event_service.data_store = data_store
+        event_service.event_listener = EventListener(data_store)
 
         # 手动初始化其他属性
-        _event_service.running = False
-        _event_service.loop = None
-        _event_service.loop_thread = None
-        _event_service.service_stats = {
+        event_service.running = False
+        event_service.loop = None
+        event_service.loop_thread = None
+        event_service._loop_running = False
+        event_service.service_stats = {
             'start_time': None,
             'total_events_processed': 0,
             'sorting_events_count': 0,
@@ -55,10 +67,13 @@ def init_event_service(db_path: str = "events.db",
         }
 
         import logging
-        _event_service.logger = logging.getLogger('EventService')
+        event_service.logger = logging.getLogger('EventService')
 
         # 调用原有的初始化方法
-        _event_service._register_internal_handlers()
+        event_service._register_internal_handlers()
+
+        # 完全初始化后再发布实例，避免其他线程在无锁快路径上拿到未初始化完成的对象
+        _event_service = event_service
 
         print(f"全局事件服务已初始化: {db_path} (优化存储: {use_optimized_storage})")
 
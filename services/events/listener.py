@@ -139,6 +139,8 @@ class EventListener:
         event = SortingEvent(
             event_type=event_type,
             timestamp=datetime.now(),
+            event_id=None,
+            metadata=None,
             sorting_type=sorting_type,
             channels=channels,
             count=count,
@@ -173,6 +175,8 @@ class EventListener:
         event = CommunicationStatusEvent(
             event_type=event_type,
             timestamp=datetime.now(),
+            event_id=None,
+            metadata=None,
             device_name=device_name,
             old_status=old_status,
             new_status=new_status,
@@ -195,6 +199,8 @@ class EventListener:
         event = PulseFrequencyEvent(
             event_type=EventType.PHOTOELECTRIC_PULSE_FREQUENCY,
             timestamp=datetime.now(),
+            event_id=None,
+            metadata=None,
             frequency=frequency,
             period=period,
             pulse_count=pulse_count,
@@ -3,7 +3,7 @@
 事件监听系统的数据模型定义
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 from typing import Optional, Dict, Any
@@ -45,7 +45,7 @@ class CommunicationStatus(Enum):
     RECONNECTING = "reconnecting"
 
 
-@dataclass
+@dataclass(slots=True)
 class BaseEvent:
     """事件基类"""
     event_type: EventType
@@ -60,7 +60,7 @@ class BaseEvent:
             self.event_id = str(uuid.uuid4())
 
 
-@dataclass
+@dataclass(slots=True)
 class SortingEvent(BaseEvent):
     """分拣事件"""
     sorting_type: SortingType
@@ -71,7 +71,7 @@ class SortingEvent(BaseEvent):
     source_data: Optional[Dict[str, Any]] = None  # 原始数据
 
 
-@dataclass
+@dataclass(slots=True)
 class CommunicationStatusEvent(BaseEvent):
     """通讯状态变更事件"""
     device_name: str  # 设备名称 (PLC, Sugar_Detector等)
@@ -81,7 +81,7 @@ class CommunicationStatusEvent(BaseEvent):
     connection_info: Optional[Dict[str, Any]] = None  # 连接信息(IP, 端口等)
 
 
-@dataclass
+@dataclass(slots=True)
 class PulseFrequencyEvent(BaseEvent):
     """光电脉冲频率事件"""
     frequency: float  # 频率 (Hz)
@@ -99,7 +99,7 @@ class SortingEventRecord:
     event_id: str = ""
     event_type: str = ""
     sorting_type: str = ""
-    channels: str = ""  # JSON字符串存储通道列表
+    channels: list[int] = field(default_factory=list)  # 通道号列表（数据库中以int32数组BLOB存储）
     count: int = 1
     weight: Optional[float] = None
     grade: Optional[int] = None
@@ -130,7 +130,7 @@ class PulseFrequencyRecord:
     pulse_count: int = 0
     measurement_duration: float = 0.0
     timestamp: Optional[datetime] = None
-    pulse_data: Optional[str] = None  # JSON字符串存储详细脉冲数据
+    pulse_data: Optional[bytes] = None  # 脉冲时间戳，float64数组BLOB（array('d').tobytes()）
 
 
 @dataclass
@@ -47,6 +47,12 @@ from .listener import EventListener
 class EventService:
     """事件监听服务主类"""
 
+    __slots__ = (
+        'db_path', 'max_queue_size', 'data_store', 'event_listener',
+        'running', 'loop', 'loop_thread', '_loop_running',
+        'service_stats', 'logger'
+    )
+
     def __init__(self, db_path: str = "events.db", max_queue_size: int = 1000):
         self.db_path = db_path
         self.max_queue_size = max_queue_size
@@ -59,6 +65,7 @@ class EventService:
         self.running = False
         self.loop = None
         self.loop_thread = None
+        self._loop_running = False  # 事件循环运行标志，避免每次发送事件都调用 loop.is_running()
 
         # 统计信息
         self.service_stats = {
@@ -151,6 +158,7 @@ class EventService:
         try:
             # 启动事件监听器
             self.loop.run_until_complete(self.event_listener.start())
+            self._loop_running = True
 
             # 运行事件循环
             self.loop.run_forever()
@@ -158,6 +166,8 @@ class EventService:
         except Exception as e:
             self.logger.error(f"事件循环异常: {e}")
         finally:
+            self._loop_running = False
+
             # 停止事件监听器
             try:
                 self.loop.run_until_complete(self.event_listener.stop())
@@ -248,9 +258,10 @@ class EventService:
 
     def _emit_async(self, coro):
         """异步发送事件"""
-        if self.loop and self.loop.is_running():
+        if self._loop_running:
             asyncio.run_coroutine_threadsafe(coro, self.loop)
         else:
+            coro.close()
             self.logger.warning("事件循环未运行，无法发送事件")
 
     # ========== 扩展接口 ==========
@@ -279,7 +290,7 @@ class EventService:
             'service': self.service_stats.copy(),
             'listener': listener_stats,
             'running': self.running,
-            'loop_running': self.loop and self.loop.is_running() if self.loop else False
+            'loop_running': self._loop_running
         }
 
     # ========== 数据查询接口（异步） ==========
@@ -314,13 +325,16 @@ class EventService:
 
 # 全局事件服务实例
 _event_service_instance: Optional[EventService] = None
+_event_service_lock = threading.Lock()
 
 
 def get_event_service() -> EventService:
-    """获取全局事件服务实例"""
+    """获取全局事件服务实例（双重检查加锁，避免并发初始化创建多个实例）"""
     global _event_service_instance
     if _event_service_instance is None:
-        _event_service_instance = EventService()
+        with _event_service_lock:
+            if _event_service_instance is None:
+                _event_service_instance = EventService()
     return _event_service_instance
 
 
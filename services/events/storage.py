@@ -10,11 +10,25 @@ import threading
 import logging
 import json
 import time
+from array import array
+from contextlib import asynccontextmanager
+from operator import attrgetter
 from datetime import datetime, date
-from typing import List, Optional, Dict, Any, Deque
-from collections import deque
+from typing import List, Optional, Dict, Any, Deque, AsyncIterator
+from collections import deque, defaultdict
 from dataclasses import dataclass
 
+try:
+    import orjson
+
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def _json_dumps(obj) -> str:
+        """JSON序列化（orjson，C实现）"""
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS).decode()
+except ImportError:  # 未安装 orjson 时回退到标准库
+    _json_dumps = json.dumps
+
 from .models import (
     SortingEvent, CommunicationStatusEvent, PulseFrequencyEvent,
     SortingEventRecord, CommunicationStatusRecord, PulseFrequencyRecord,
@@ -22,105 +36,350 @@ from .models import (
 )
 
 
-@dataclass
+@dataclass(slots=True)
 class BatchConfig:
     """批量提交配置"""
     batch_size: int = 50  # 批量大小
     flush_interval: float = 2.0  # 强制刷新间隔（秒）
     max_buffer_size: int = 500  # 最大缓冲区大小
     connection_pool_size: int = 3  # 连接池大小
+    dedup_window_size: int = 10000  # 去重窗口（最近事件ID数量）
+
+
+# 批量插入时按固定字段顺序一次性取出事件属性（C实现，支持点号路径）
+_SORTING_EVENT_FIELDS = attrgetter(
+    'event_id', 'event_type.value', 'sorting_type.value', 'channels',
+    'count', 'weight', 'grade', 'timestamp', 'source_data'
+)
+_COMMUNICATION_EVENT_FIELDS = attrgetter(
+    'event_id', 'event_type.value', 'device_name', 'old_status', 'new_status.value',
+    'error_message', 'connection_info', 'timestamp'
+)
+_PULSE_FREQUENCY_EVENT_FIELDS = attrgetter(
+    'event_id', 'event_type.value', 'frequency', 'period', 'pulse_count',
+    'measurement_duration', 'timestamp', 'pulse_timestamps'
+)
+
+def _to_epoch_us(dt: datetime) -> int:
+    """datetime -> unix微秒整数（数据库存储格式）"""
+    return round(dt.timestamp() * 1_000_000)
+
+
+def _from_epoch_us(value: int) -> datetime:
+    """unix微秒整数 -> datetime"""
+    return datetime.fromtimestamp(value / 1_000_000)
+
+
+def _unpack_channels(value: bytes) -> List[int]:
+    """通道号BLOB -> 通道号列表"""
+    channels = array('i')
+    channels.frombytes(value)
+    return channels.tolist()
+
+
+# 旧版本以ISO字符串存储时间的列：(表名, 列名, 旧列类型)；
+# 同一版本中通道号、脉冲时间戳以JSON文本存储，随表一起转换
+LEGACY_TEXT_TIME_COLUMNS = (
+    ('sorting_events', 'timestamp', 'TIMESTAMP'),
+    ('communication_status_events', 'timestamp', 'TIMESTAMP'),
+    ('pulse_frequency_events', 'timestamp', 'TIMESTAMP'),
+    ('event_statistics', 'date', 'DATE'),
+)
+
+# 旧表 -> 新表的导入语句，转换函数在迁移连接上注册
+LEGACY_IMPORT_SQL = {
+    'sorting_events': '''
+        INSERT INTO sorting_events
+            (id, event_id, event_type, sorting_type, channels, count, weight, grade, timestamp, source_data,
+             created_at)
+        SELECT id, event_id, event_type, sorting_type, json_to_int32_blob(channels), count, weight, grade,
+               iso_to_epoch_us(timestamp), source_data, created_at
+        FROM sorting_events_legacy
+    ''',
+    'communication_status_events': '''
+        INSERT INTO communication_status_events
+            (id, event_id, device_name, old_status, new_status, error_message, connection_info, timestamp,
+             created_at)
+        SELECT id, event_id, device_name, old_status, new_status, error_message, connection_info,
+               iso_to_epoch_us(timestamp), created_at
+        FROM communication_status_events_legacy
+    ''',
+    'pulse_frequency_events': '''
+        INSERT INTO pulse_frequency_events
+            (id, event_id, frequency, period, pulse_count, measurement_duration, timestamp, pulse_data, created_at)
+        SELECT id, event_id, frequency, period, pulse_count, measurement_duration, iso_to_epoch_us(timestamp),
+               json_to_float64_blob(pulse_data), created_at
+        FROM pulse_frequency_events_legacy
+    ''',
+    'event_statistics': '''
+        INSERT INTO event_statistics (id, date, event_type, total_count, avg_frequency, error_count, success_count)
+        SELECT id, iso_to_ordinal(date), event_type, total_count, avg_frequency, error_count, success_count
+        FROM event_statistics_legacy
+    ''',
+}
+
+
+def _iso_to_epoch_us(value: Optional[str]) -> Optional[int]:
+    """迁移用：ISO时间字符串 -> unix微秒整数"""
+    return _to_epoch_us(datetime.fromisoformat(value)) if value is not None else None
+
+
+def _iso_to_ordinal(value: Optional[str]) -> Optional[int]:
+    """迁移用：ISO日期字符串 -> 日序号 date.toordinal()"""
+    return date.fromisoformat(value).toordinal() if value is not None else None
+
+
+def _json_to_int32_blob(value: Optional[str]) -> Optional[bytes]:
+    """迁移用：通道号JSON数组 -> int32数组BLOB"""
+    return array('i', json.loads(value)).tobytes() if value is not None else None
+
+
+def _json_to_float64_blob(value: Optional[str]) -> Optional[bytes]:
+    """迁移用：脉冲时间戳JSON数组 -> float64数组BLOB，空数组与旧版本一样存为NULL"""
+    if not value:
+        return None
+    values = json.loads(value)
+    return array('d', values).tobytes() if values else None
+
+
+# 每个新连接建立时执行的PRAGMA
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456',  # 256MB
+    'PRAGMA cache_size=-65536',  # 64MB
+)
+
+
+class ConnectionPool:
+    """aiosqlite连接池
+
+    连接在首次使用时创建，用完放回池中复用，避免每次批处理/查询都重新打开数据库。
+    """
+
+    def __init__(self, db_path: str, pool_size: int = 3):
+        self.db_path = db_path
+        self.pool_size = max(1, pool_size)
+        self._idle: Deque[aiosqlite.Connection] = deque()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def create_connection(self) -> aiosqlite.Connection:
+        """创建并配置新连接"""
+        db = await aiosqlite.connect(self.db_path)
+        for pragma in CONNECTION_PRAGMAS:
+            await db.execute(pragma)
+        return db
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[aiosqlite.Connection]:
+        """从池中获取连接"""
+        if self._semaphore is None:
+            # 在事件循环内惰性创建
+            self._semaphore = asyncio.Semaphore(self.pool_size)
+
+        async with self._semaphore:
+            db = self._idle.pop() if self._idle else await self.create_connection()
+            try:
+                yield db
+            except BaseException:
+                # 出错的连接状态未知，直接关闭不放回池中
+                await db.close()
+                raise
+            self._idle.append(db)
+
+    async def close(self):
+        """关闭池中所有空闲连接"""
+        while self._idle:
+            await self._idle.pop().close()
 
 
 class EventBuffer:
     """事件缓冲区"""
 
-    def __init__(self, max_size: int = 500):
+    def __init__(self, max_size: int = 500, batch_size: int = 50, dedup_window_size: int = 10000):
         self.max_size = max_size
-        self.sorting_events: Deque[SortingEvent] = deque()
-        self.communication_events: Deque[CommunicationStatusEvent] = deque()
-        self.pulse_frequency_events: Deque[PulseFrequencyEvent] = deque()
-        self.last_flush_time = time.time()
-        self._lock = threading.Lock()
-
-    def add_sorting_event(self, event: SortingEvent):
-        """添加分拣事件到缓冲区"""
-        with self._lock:
-            self.sorting_events.append(event)
-            if len(self.sorting_events) > self.max_size:
-                self.sorting_events.popleft()
-
-    def add_communication_event(self, event: CommunicationStatusEvent):
-        """添加通讯事件到缓冲区"""
-        with self._lock:
-            self.communication_events.append(event)
-            if len(self.communication_events) > self.max_size:
-                self.communication_events.popleft()
-
-    def add_pulse_frequency_event(self, event: PulseFrequencyEvent):
-        """添加脉冲频率事件到缓冲区"""
-        with self._lock:
-            self.pulse_frequency_events.append(event)
-            if len(self.pulse_frequency_events) > self.max_size:
-                self.pulse_frequency_events.popleft()
+        # 有界deque：超出容量时自动丢弃最旧事件，append本身在GIL下是原子的，生产者无需加锁
+        self.sorting_events: Deque[SortingEvent] = deque(maxlen=max_size)
+        self.communication_events: Deque[CommunicationStatusEvent] = deque(maxlen=max_size)
+        self.pulse_frequency_events: Deque[PulseFrequencyEvent] = deque(maxlen=max_size)
+        # 每种事件独立加锁（仅 get_batch 的多步出队使用），互不阻塞
+        self._sorting_lock = threading.Lock()
+        self._communication_lock = threading.Lock()
+        self._pulse_frequency_lock = threading.Lock()
+
+        # 刷新触发：缓冲量达到阈值（批量大小或接近满）时唤醒批处理器，代替定时轮询
+        self.flush_threshold = max(1, min(batch_size, int(max_size * 0.8)))
+        self._flush_signal = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # 最近事件ID窗口：在进入数据库前过滤重复提交的事件，数据库UNIQUE约束仍作为兜底
+        self._recent_ids: Deque[str] = deque()
+        self._recent_id_set = set()
+        self._dedup_window_size = dedup_window_size
+
+    def _is_duplicate(self, event_id: str) -> bool:
+        """检查事件ID是否重复，不重复则记入窗口"""
+        recent_id_set = self._recent_id_set
+        if event_id in recent_id_set:
+            return True
+
+        recent_ids = self._recent_ids
+        if len(recent_ids) >= self._dedup_window_size:
+            recent_id_set.discard(recent_ids.popleft())
+        recent_ids.append(event_id)
+        recent_id_set.add(event_id)
+        return False
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        """绑定批处理器所在的事件循环"""
+        self._loop = loop
+
+    def _notify(self):
+        """缓冲量达到阈值时触发刷新信号"""
+        if self._flush_signal.is_set() or self._loop is None:
+            return
+        if self.get_total_size() < self.flush_threshold:
+            return
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if running_loop is self._loop:
+            self._flush_signal.set()
+        else:
+            # 来自其他线程的生产者
+            self._loop.call_soon_threadsafe(self._flush_signal.set)
+
+    async def wait_for_flush(self, timeout: float):
+        """等待刷新信号，超时返回"""
+        try:
+            await asyncio.wait_for(self._flush_signal.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._flush_signal.clear()
+
+    def add_sorting_event(self, event: SortingEvent) -> bool:
+        """添加分拣事件到缓冲区，重复事件返回False"""
+        if self._is_duplicate(event.event_id):
+            return False
+        self.sorting_events.append(event)
+        self._notify()
+        return True
+
+    def add_communication_event(self, event: CommunicationStatusEvent) -> bool:
+        """添加通讯事件到缓冲区，重复事件返回False"""
+        if self._is_duplicate(event.event_id):
+            return False
+        self.communication_events.append(event)
+        self._notify()
+        return True
+
+    def add_pulse_frequency_event(self, event: PulseFrequencyEvent) -> bool:
+        """添加脉冲频率事件到缓冲区，重复事件返回False"""
+        if self._is_duplicate(event.event_id):
+            return False
+        self.pulse_frequency_events.append(event)
+        self._notify()
+        return True
 
     def get_batch(self, batch_size: int) -> Dict[str, List]:
         """获取一批事件进行处理"""
-        with self._lock:
-            batch = {
-                'sorting': [],
-                'communication': [],
-                'pulse_frequency': []
-            }
-
-            # 获取分拣事件批次
-            for _ in range(min(batch_size, len(self.sorting_events))):
-                if self.sorting_events:
-                    batch['sorting'].append(self.sorting_events.popleft())
-
-            # 获取通讯事件批次
-            for _ in range(min(batch_size, len(self.communication_events))):
-                if self.communication_events:
-                    batch['communication'].append(self.communication_events.popleft())
-
-            # 获取脉冲频率事件批次
-            for _ in range(min(batch_size, len(self.pulse_frequency_events))):
-                if self.pulse_frequency_events:
-                    batch['pulse_frequency'].append(self.pulse_frequency_events.popleft())
-
-            return batch
+        # 获取分拣事件批次
+        with self._sorting_lock:
+            events = self.sorting_events
+            sorting = [events.popleft() for _ in range(min(batch_size, len(events)))]
 
-    def get_total_size(self) -> int:
-        """获取缓冲区总大小"""
-        with self._lock:
-            return len(self.sorting_events) + len(self.communication_events) + len(self.pulse_frequency_events)
-
-    def should_flush(self, batch_size: int, flush_interval: float) -> bool:
-        """判断是否应该刷新缓冲区"""
-        with self._lock:
-            total_size = self.get_total_size()
-            time_elapsed = time.time() - self.last_flush_time
-
-            return (
-                    total_size >= batch_size or  # 达到批量大小
-                    (total_size > 0 and time_elapsed >= flush_interval) or  # 超时且有数据
-                    total_size >= self.max_size * 0.8  # 缓冲区接近满
-            )
+        # 获取通讯事件批次
+        with self._communication_lock:
+            events = self.communication_events
+            communication = [events.popleft() for _ in range(min(batch_size, len(events)))]
 
-    def update_flush_time(self):
-        """更新刷新时间"""
-        with self._lock:
-            self.last_flush_time = time.time()
+        # 获取脉冲频率事件批次
+        with self._pulse_frequency_lock:
+            events = self.pulse_frequency_events
+            pulse_frequency = [events.popleft() for _ in range(min(batch_size, len(events)))]
+
+        return {
+            'sorting': sorting,
+            'communication': communication,
+            'pulse_frequency': pulse_frequency
+        }
+
+    def get_total_size(self) -> int:
+        """获取缓冲区总大小（无锁读取，短暂的过期值无影响）"""
+        return len(self.sorting_events) + len(self.communication_events) + len(self.pulse_frequency_events)
 
 
 class OptimizedEventDataStore:
     """优化的事件数据存储类"""
 
+    # 预定义SQL：语句文本固定，配合复用的游标命中 sqlite3 的预编译语句缓存
+    INSERT_SORTING_EVENT_SQL = '''
+        INSERT OR IGNORE INTO sorting_events
+        (event_id, event_type, sorting_type, channels, count, weight, grade, timestamp, source_data)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+
+    INSERT_COMMUNICATION_EVENT_SQL = '''
+        INSERT OR IGNORE INTO communication_status_events
+        (event_id, device_name, old_status, new_status, error_message, connection_info, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    '''
+
+    INSERT_PULSE_FREQUENCY_EVENT_SQL = '''
+        INSERT OR IGNORE INTO pulse_frequency_events
+        (event_id, frequency, period, pulse_count, measurement_duration, timestamp, pulse_data)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    '''
+
+    UPSERT_SORTING_STATISTICS_SQL = '''
+        INSERT INTO event_statistics (date, event_type, total_count, success_count)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(date, event_type) DO UPDATE SET
+            total_count = total_count + excluded.total_count,
+            success_count = success_count + excluded.success_count
+    '''
+
+    UPSERT_COMMUNICATION_STATISTICS_SQL = '''
+        INSERT INTO event_statistics (date, event_type, total_count, error_count, success_count)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(date, event_type) DO UPDATE SET
+            total_count = total_count + excluded.total_count,
+            error_count = error_count + excluded.error_count,
+            success_count = success_count + excluded.success_count
+    '''
+
+    UPSERT_PULSE_FREQUENCY_STATISTICS_SQL = '''
+        INSERT INTO event_statistics (date, event_type, total_count, avg_frequency)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(date, event_type) DO UPDATE SET
+            total_count = total_count + excluded.total_count,
+            avg_frequency = (COALESCE(avg_frequency, 0) * total_count +
+                             excluded.avg_frequency * excluded.total_count) /
+                            (total_count + excluded.total_count)
+    '''
+
     def __init__(self, db_path: str = "events.db", batch_config: BatchConfig = None):
         self.db_path = db_path
         self.batch_config = batch_config or BatchConfig()
 
         # 缓冲区
-        self.buffer = EventBuffer(self.batch_config.max_buffer_size)
+        self.buffer = EventBuffer(
+            self.batch_config.max_buffer_size,
+            self.batch_config.batch_size,
+            self.batch_config.dedup_window_size
+        )
+
+        # 连接池（查询使用）
+        self.pool = ConnectionPool(db_path, self.batch_config.connection_pool_size)
+        # 批处理器专用的长连接，在批处理器启动/停止时打开/关闭
+        self._writer_conn: Optional[aiosqlite.Connection] = None
+        # 写连接上按事件种类复用的游标
+        self._writer_cursors: Dict[str, aiosqlite.Cursor] = {}
 
         # 批处理控制
         self.batch_processor_running = False
@@ -147,6 +406,21 @@ class OptimizedEventDataStore:
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
 
+            # 文件级参数：page_size/auto_vacuum 需在建表前设置，且 page_size 需在切换WAL前设置；
+            # journal_mode 写入文件头后对之后的所有连接生效
+            cursor.execute('PRAGMA page_size=8192')
+            cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute('PRAGMA synchronous=NORMAL')
+
+            # 建表与旧数据迁移在一个事务内完成，迁移中途退出时保持旧表不变
+            cursor.execute('BEGIN')
+            conn.create_function('iso_to_epoch_us', 1, _iso_to_epoch_us, deterministic=True)
+            conn.create_function('iso_to_ordinal', 1, _iso_to_ordinal, deterministic=True)
+            conn.create_function('json_to_int32_blob', 1, _json_to_int32_blob, deterministic=True)
+            conn.create_function('json_to_float64_blob', 1, _json_to_float64_blob, deterministic=True)
+            legacy_tables = self._rename_legacy_tables(cursor)
+
             # 分拣事件表
             cursor.execute('''
                            CREATE TABLE IF NOT EXISTS sorting_events
@@ -170,9 +444,9 @@ class OptimizedEventDataStore:
                                NOT
                                NULL,
                                channels
-                               TEXT
+                               BLOB
                                NOT
-                               NULL, -- JSON array
+                               NULL, -- int32数组 array('i').tobytes()
                                count
                                INTEGER
                                NOT
@@ -184,9 +458,9 @@ class OptimizedEventDataStore:
                                grade
                                INTEGER,
                                timestamp
-                               TIMESTAMP
+                               INTEGER
                                NOT
-                               NULL,
+                               NULL, -- unix微秒
                                source_data
                                TEXT, -- JSON string
                                created_at
@@ -225,9 +499,9 @@ class OptimizedEventDataStore:
                                connection_info
                                TEXT, -- JSON string
                                timestamp
-                               TIMESTAMP
+                               INTEGER
                                NOT
-                               NULL,
+                               NULL, -- unix微秒
                                created_at
                                TIMESTAMP
                                DEFAULT
@@ -266,11 +540,11 @@ class OptimizedEventDataStore:
                                NOT
                                NULL,
                                timestamp
-                               TIMESTAMP
+                               INTEGER
                                NOT
-                               NULL,
+                               NULL, -- unix微秒
                                pulse_data
-                               TEXT, -- JSON string for pulse_timestamps
+                               BLOB, -- float64数组 array('d').tobytes()，对应 pulse_timestamps
                                created_at
                                TIMESTAMP
                                DEFAULT
@@ -288,9 +562,9 @@ class OptimizedEventDataStore:
                                KEY
                                AUTOINCREMENT,
                                date
-                               DATE
+                               INTEGER
                                NOT
-                               NULL,
+                               NULL, -- 日序号 date.toordinal()
                                event_type
                                TEXT
                                NOT
@@ -319,6 +593,9 @@ class OptimizedEventDataStore:
                                )
                            ''')
 
+            # 先导入并删除旧表（连同其同名索引），再在新表上建索引
+            self._import_legacy_tables(cursor, legacy_tables)
+
             # 创建索引
             indexes = [
                 'CREATE INDEX IF NOT EXISTS idx_sorting_events_timestamp ON sorting_events(timestamp)',
@@ -336,12 +613,34 @@ class OptimizedEventDataStore:
 
         self.logger.info("优化版事件数据库初始化完成")
 
+    @staticmethod
+    def _rename_legacy_tables(cursor) -> List[str]:
+        """时间列仍为ISO字符串的旧表改名保留，待新表建好后导入"""
+        legacy_tables = []
+        for table, column, legacy_type in LEGACY_TEXT_TIME_COLUMNS:
+            row = cursor.execute('SELECT type FROM pragma_table_info(?) WHERE name = ?', (table, column)).fetchone()
+            if row and row[0].upper() == legacy_type:
+                cursor.execute(f'ALTER TABLE {table} RENAME TO {table}_legacy')
+                legacy_tables.append(table)
+        return legacy_tables
+
+    def _import_legacy_tables(self, cursor, legacy_tables: List[str]):
+        """将旧表数据转换为整数时间/BLOB格式导入新表，然后删除旧表"""
+        for table in legacy_tables:
+            cursor.execute(LEGACY_IMPORT_SQL[table])
+            cursor.execute(f'DROP TABLE {table}_legacy')
+            self.logger.info(f"{table} 时间列已迁移为整数格式")
+
     async def start_batch_processor(self):
         """启动批处理器"""
         if self.batch_processor_running:
             return
 
+        self._writer_conn = await self.pool.create_connection()
+        for kind in ('sorting', 'communication', 'pulse_frequency'):
+            self._writer_cursors[kind] = await self._writer_conn.cursor()
         self.batch_processor_running = True
+        self.buffer.bind_loop(asyncio.get_running_loop())
         self.batch_processor_task = asyncio.create_task(self._batch_processor_loop())
         self.logger.info("批处理器已启动")
 
@@ -361,6 +660,14 @@ class OptimizedEventDataStore:
 
         # 处理剩余的缓冲区数据
         await self._flush_buffer(force=True)
+
+        if self._writer_conn is not None:
+            for cursor in self._writer_cursors.values():
+                await cursor.close()
+            self._writer_cursors.clear()
+            await self._writer_conn.close()
+            self._writer_conn = None
+        await self.pool.close()
         self.logger.info("批处理器已停止")
 
     async def _batch_processor_loop(self):
@@ -369,20 +676,32 @@ class OptimizedEventDataStore:
 
         while self.batch_processor_running:
             try:
-                # 检查是否需要刷新缓冲区
-                if self.buffer.should_flush(
-                        self.batch_config.batch_size,
-                        self.batch_config.flush_interval
-                ):
-                    await self._flush_buffer()
+                # 缓冲量不足一批时，等待刷新信号或刷新间隔超时
+                if self.buffer.get_total_size() < self.buffer.flush_threshold:
+                    await self.buffer.wait_for_flush(self.batch_config.flush_interval)
 
-                # 休眠一小段时间
-                await asyncio.sleep(0.1)
+                if self.buffer.get_total_size() > 0:
+                    await self._flush_buffer()
 
             except Exception as e:
                 self.logger.error(f"批处理循环异常: {e}")
                 await asyncio.sleep(1.0)
 
+    @asynccontextmanager
+    async def _writer_connection(self) -> AsyncIterator[aiosqlite.Connection]:
+        """获取写连接：批处理器运行时复用长连接，否则从连接池获取"""
+        if self._writer_conn is not None:
+            yield self._writer_conn
+        else:
+            async with self.pool.connection() as db:
+                yield db
+
+    def _get_cursor(self, db: aiosqlite.Connection, kind: str):
+        """获取执行批量语句的对象：写长连接上复用游标，其他连接直接使用连接本身"""
+        if db is self._writer_conn:
+            return self._writer_cursors[kind]
+        return db
+
     async def _flush_buffer(self, force: bool = False):
         """刷新缓冲区数据到数据库"""
         batch_size = self.batch_config.batch_size
@@ -409,7 +728,7 @@ class OptimizedEventDataStore:
 
         try:
             # 批量保存到数据库
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._writer_connection() as db:
                 # 开始事务
                 await db.execute('BEGIN TRANSACTION')
 
@@ -452,8 +771,6 @@ class OptimizedEventDataStore:
                                 (1 - alpha) * self.stats['avg_batch_process_time']
                         )
 
-                    self.buffer.update_flush_time()
-
                     # 记录批处理信息
                     if actual_batch_size >= 10:  # 只记录较大的批次
                         self.logger.info(
@@ -478,29 +795,38 @@ class OptimizedEventDataStore:
         if not events:
             return
 
+        # 单次遍历：同时生成插入行和统计增量，时间戳和日期只计算一次
+        dumps = _json_dumps
         data = []
-        for event in events:
+        stats_updates = defaultdict(lambda: [0, 0])  # [total_count, success_count]
+
+        for (event_id, event_type, sorting_type, channels,
+             count, weight, grade, timestamp, source_data) in map(_SORTING_EVENT_FIELDS, events):
+            day = timestamp.toordinal()
+            timestamp = _to_epoch_us(timestamp)
             data.append((
-                event.event_id,
-                event.event_type.value,
-                event.sorting_type.value,
-                json.dumps(event.channels),
-                event.count,
-                event.weight,
-                event.grade,
-                event.timestamp.isoformat(),
-                json.dumps(event.source_data) if event.source_data else None
+                event_id,
+                event_type,
+                sorting_type,
+                array('i', channels).tobytes(),
+                count,
+                weight,
+                grade,
+                timestamp,
+                dumps(source_data) if source_data else None
             ))
 
-        await db.executemany('''
-                             INSERT
-                             OR IGNORE INTO sorting_events 
-            (event_id, event_type, sorting_type, channels, count, weight, grade, timestamp, source_data)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                             ''', data)
+            # 按日期和事件类型分组统计
+            stats = stats_updates[(day, event_type)]
+            stats[0] += count
+            if grade and grade > 0:
+                stats[1] += count
+
+        cursor = self._get_cursor(db, 'sorting')
+        await cursor.executemany(self.INSERT_SORTING_EVENT_SQL, data)
 
         # 批量更新统计
-        await self._batch_update_sorting_statistics(db, events)
+        await self._batch_update_sorting_statistics(db, stats_updates)
 
     async def _batch_insert_communication_events(self, db: aiosqlite.Connection,
                                                  events: List[CommunicationStatusEvent]):
@@ -508,27 +834,38 @@ class OptimizedEventDataStore:
         if not events:
             return
 
+        dumps = _json_dumps
         data = []
-        for event in events:
+        stats_updates = defaultdict(lambda: [0, 0, 0])  # [total_count, error_count, success_count]
+
+        for (event_id, event_type, device_name, old_status, new_status,
+             error_message, connection_info, timestamp) in map(_COMMUNICATION_EVENT_FIELDS, events):
+            day = timestamp.toordinal()
+            timestamp = _to_epoch_us(timestamp)
             data.append((
-                event.event_id,
-                event.device_name,
-                event.old_status.value if event.old_status else None,
-                event.new_status.value,
-                event.error_message,
-                json.dumps(event.connection_info) if event.connection_info else None,
-                event.timestamp.isoformat()
+                event_id,
+                device_name,
+                old_status.value if old_status else None,
+                new_status,
+                error_message,
+                dumps(connection_info) if connection_info else None,
+                timestamp
             ))
 
-        await db.executemany('''
-                             INSERT
-                             OR IGNORE INTO communication_status_events 
-            (event_id, device_name, old_status, new_status, error_message, connection_info, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-                             ''', data)
+            stats = stats_updates[(day, event_type)]
+            stats[0] += 1
+
+            is_error = new_status in ['error', 'disconnected', 'timeout']
+            if is_error:
+                stats[1] += 1
+            else:
+                stats[2] += 1
+
+        cursor = self._get_cursor(db, 'communication')
+        await cursor.executemany(self.INSERT_COMMUNICATION_EVENT_SQL, data)
 
         # 批量更新统计
-        await self._batch_update_communication_statistics(db, events)
+        await self._batch_update_communication_statistics(db, stats_updates)
 
     async def _batch_insert_pulse_frequency_events(self, db: aiosqlite.Connection, events: List[PulseFrequencyEvent]):
         """批量插入脉冲频率事件"""
@@ -536,173 +873,78 @@ class OptimizedEventDataStore:
             return
 
         data = []
-        for event in events:
+        stats_updates = defaultdict(lambda: [0, 0.0])  # [total_count, frequency_sum]
+
+        for (event_id, event_type, frequency, period, pulse_count,
+             measurement_duration, timestamp, pulse_timestamps) in map(_PULSE_FREQUENCY_EVENT_FIELDS, events):
+            day = timestamp.toordinal()
+            timestamp = _to_epoch_us(timestamp)
             data.append((
-                event.event_id,
-                event.frequency,
-                event.period,
-                event.pulse_count,
-                event.measurement_duration,
-                event.timestamp.isoformat(),
-                json.dumps(event.pulse_timestamps) if event.pulse_timestamps else None
+                event_id,
+                frequency,
+                period,
+                pulse_count,
+                measurement_duration,
+                timestamp,
+                array('d', pulse_timestamps).tobytes() if pulse_timestamps else None
             ))
 
-        await db.executemany('''
-                             INSERT
-                             OR IGNORE INTO pulse_frequency_events 
-            (event_id, frequency, period, pulse_count, measurement_duration, timestamp, pulse_data)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-                             ''', data)
+            stats = stats_updates[(day, event_type)]
+            stats[0] += 1
+            stats[1] += frequency
+
+        cursor = self._get_cursor(db, 'pulse_frequency')
+        await cursor.executemany(self.INSERT_PULSE_FREQUENCY_EVENT_SQL, data)
 
         # 批量更新统计
-        await self._batch_update_pulse_frequency_statistics(db, events)
+        await self._batch_update_pulse_frequency_statistics(db, stats_updates)
 
-    async def _batch_update_sorting_statistics(self, db: aiosqlite.Connection, events: List[SortingEvent]):
+    async def _batch_update_sorting_statistics(self, db: aiosqlite.Connection,
+                                               stats_updates: Dict[tuple, List[int]]):
         """批量更新分拣事件统计"""
-        if not events:
+        if not stats_updates:
             return
 
-        # 按日期和事件类型分组统计
-        stats_updates = {}
-
-        for event in events:
-            event_date = event.timestamp.date().isoformat()
-            event_type = event.event_type.value
-            key = (event_date, event_type)
-
-            if key not in stats_updates:
-                stats_updates[key] = {
-                    'total_count': 0,
-                    'success_count': 0
-                }
-
-            stats_updates[key]['total_count'] += event.count
-            if event.grade and event.grade > 0:
-                stats_updates[key]['success_count'] += event.count
-
-        # 批量更新统计表
-        for (event_date, event_type), stats in stats_updates.items():
-            await db.execute('''
-                INSERT OR REPLACE INTO event_statistics 
-                (date, event_type, total_count, success_count)
-                VALUES (
-                    ?, ?, 
-                    COALESCE((SELECT total_count FROM event_statistics WHERE date = ? AND event_type = ?), 0) + ?,
-                    COALESCE((SELECT success_count FROM event_statistics WHERE date = ? AND event_type = ?), 0) + ?
-                )
-            ''', (
-                event_date, event_type,
-                event_date, event_type, stats['total_count'],
-                event_date, event_type, stats['success_count']
-            ))
+        # 批量更新统计表（UPSERT）
+        cursor = self._get_cursor(db, 'sorting')
+        await cursor.executemany(self.UPSERT_SORTING_STATISTICS_SQL, [
+            (event_date, event_type, total_count, success_count)
+            for (event_date, event_type), (total_count, success_count) in stats_updates.items()
+        ])
 
     async def _batch_update_communication_statistics(self, db: aiosqlite.Connection,
-                                                     events: List[CommunicationStatusEvent]):
+                                                     stats_updates: Dict[tuple, List[int]]):
         """批量更新通讯事件统计"""
-        if not events:
+        if not stats_updates:
             return
 
-        stats_updates = {}
-
-        for event in events:
-            event_date = event.timestamp.date().isoformat()
-            event_type = event.event_type.value
-            key = (event_date, event_type)
-
-            if key not in stats_updates:
-                stats_updates[key] = {
-                    'total_count': 0,
-                    'error_count': 0,
-                    'success_count': 0
-                }
-
-            stats_updates[key]['total_count'] += 1
-
-            is_error = event.new_status.value in ['error', 'disconnected', 'timeout']
-            if is_error:
-                stats_updates[key]['error_count'] += 1
-            else:
-                stats_updates[key]['success_count'] += 1
-
-        # 批量更新统计表
-        for (event_date, event_type), stats in stats_updates.items():
-            await db.execute('''
-                INSERT OR REPLACE INTO event_statistics 
-                (date, event_type, total_count, error_count, success_count)
-                VALUES (
-                    ?, ?, 
-                    COALESCE((SELECT total_count FROM event_statistics WHERE date = ? AND event_type = ?), 0) + ?,
-                    COALESCE((SELECT error_count FROM event_statistics WHERE date = ? AND event_type = ?), 0) + ?,
-                    COALESCE((SELECT success_count FROM event_statistics WHERE date = ? AND event_type = ?), 0) + ?
-                )
-            ''', (
-                event_date, event_type,
-                event_date, event_type, stats['total_count'],
-                event_date, event_type, stats['error_count'],
-                event_date, event_type, stats['success_count']
-            ))
+        # 批量更新统计表（UPSERT）
+        cursor = self._get_cursor(db, 'communication')
+        await cursor.executemany(self.UPSERT_COMMUNICATION_STATISTICS_SQL, [
+            (event_date, event_type, total_count, error_count, success_count)
+            for (event_date, event_type), (total_count, error_count, success_count) in stats_updates.items()
+        ])
 
     async def _batch_update_pulse_frequency_statistics(self, db: aiosqlite.Connection,
-                                                       events: List[PulseFrequencyEvent]):
+                                                       stats_updates: Dict[tuple, List[Any]]):
         """批量更新脉冲频率统计"""
-        if not events:
+        if not stats_updates:
             return
 
-        stats_updates = {}
-
-        for event in events:
-            event_date = event.timestamp.date().isoformat()
-            event_type = event.event_type.value
-            key = (event_date, event_type)
-
-            if key not in stats_updates:
-                stats_updates[key] = {
-                    'total_count': 0,
-                    'frequency_sum': 0.0,
-                    'frequency_count': 0
-                }
-
-            stats_updates[key]['total_count'] += 1
-            stats_updates[key]['frequency_sum'] += event.frequency
-            stats_updates[key]['frequency_count'] += 1
-
-        # 批量更新统计表
-        for (event_date, event_type), stats in stats_updates.items():
-            avg_frequency = stats['frequency_sum'] / stats['frequency_count']
-
-            await db.execute('''
-                INSERT OR REPLACE INTO event_statistics 
-                (date, event_type, total_count, avg_frequency)
-                SELECT 
-                    ? as date,
-                    ? as event_type,
-                    COALESCE(old_stats.total_count, 0) + ? as total_count,
-                    (COALESCE(old_stats.avg_frequency * old_stats.total_count, 0) + ?) / 
-                    (COALESCE(old_stats.total_count, 0) + ?) as avg_frequency
-                FROM (
-                    SELECT total_count, avg_frequency 
-                    FROM event_statistics 
-                    WHERE date = ? AND event_type = ?
-                    UNION ALL 
-                    SELECT 0, 0 WHERE NOT EXISTS (
-                        SELECT 1 FROM event_statistics WHERE date = ? AND event_type = ?
-                    )
-                    LIMIT 1
-                ) as old_stats
-            ''', (
-                event_date, event_type, stats['total_count'],
-                stats['frequency_sum'], stats['total_count'],
-                event_date, event_type,
-                event_date, event_type
-            ))
+        # 批量更新统计表（UPSERT，按加权方式合并平均频率）
+        cursor = self._get_cursor(db, 'pulse_frequency')
+        await cursor.executemany(self.UPSERT_PULSE_FREQUENCY_STATISTICS_SQL, [
+            (event_date, event_type, total_count, frequency_sum / total_count)
+            for (event_date, event_type), (total_count, frequency_sum) in stats_updates.items()
+        ])
 
     # ========== 公共接口方法 ==========
 
     async def save_sorting_event(self, event: SortingEvent) -> bool:
         """保存分拣事件到缓冲区"""
         try:
-            self.buffer.add_sorting_event(event)
-            self.stats['total_events_buffered'] += 1
+            if self.buffer.add_sorting_event(event):
+                self.stats['total_events_buffered'] += 1
             return True
         except Exception as e:
             self.logger.error(f"缓冲分拣事件失败: {e}")
@@ -711,8 +953,8 @@ class OptimizedEventDataStore:
     async def save_communication_status_event(self, event: CommunicationStatusEvent) -> bool:
         """保存通讯状态事件到缓冲区"""
         try:
-            self.buffer.add_communication_event(event)
-            self.stats['total_events_buffered'] += 1
+            if self.buffer.add_communication_event(event):
+                self.stats['total_events_buffered'] += 1
             return True
         except Exception as e:
             self.logger.error(f"缓冲通讯事件失败: {e}")
@@ -721,8 +963,8 @@ class OptimizedEventDataStore:
     async def save_pulse_frequency_event(self, event: PulseFrequencyEvent) -> bool:
         """保存脉冲频率事件到缓冲区"""
         try:
-            self.buffer.add_pulse_frequency_event(event)
-            self.stats['total_events_buffered'] += 1
+            if self.buffer.add_pulse_frequency_event(event):
+                self.stats['total_events_buffered'] += 1
             return True
         except Exception as e:
             self.logger.error(f"缓冲脉冲频率事件失败: {e}")
@@ -737,24 +979,28 @@ class OptimizedEventDataStore:
                                  limit: int = 100) -> List[SortingEventRecord]:
         """查询分拣事件记录"""
         try:
-            query = "SELECT * FROM sorting_events WHERE 1=1"
+            conditions = []
             params = []
 
             if start_time:
-                query += " AND timestamp >= ?"
-                params.append(start_time.isoformat())
+                conditions.append("timestamp >= ?")
+                params.append(_to_epoch_us(start_time))
             if end_time:
-                query += " AND timestamp <= ?"
-                params.append(end_time.isoformat())
+                conditions.append("timestamp <= ?")
+                params.append(_to_epoch_us(end_time))
             if event_types:
                 placeholders = ','.join('?' * len(event_types))
-                query += f" AND event_type IN ({placeholders})"
+                conditions.append(f"event_type IN ({placeholders})")
                 params.extend([et.value for et in event_types])
 
-            query += " ORDER BY timestamp DESC LIMIT ?"
+            where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+            query = (
+                "SELECT id, event_id, event_type, sorting_type, channels, count, weight, grade, "
+                f"timestamp, source_data FROM sorting_events{where} ORDER BY timestamp DESC LIMIT ?"
+            )
             params.append(limit)
 
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self.pool.connection() as db:
                 async with db.execute(query, params) as cursor:
                     rows = await cursor.fetchall()
 
@@ -765,11 +1011,11 @@ class OptimizedEventDataStore:
                             event_id=row[1],
                             event_type=row[2],
                             sorting_type=row[3],
-                            channels=row[4],
+                            channels=_unpack_channels(row[4]),
                             count=row[5],
                             weight=row[6],
                             grade=row[7],
-                            timestamp=datetime.fromisoformat(row[8]) if row[8] else None,
+                            timestamp=_from_epoch_us(row[8]) if row[8] is not None else None,
                             source_data=row[9]
                         ))
 
@@ -795,7 +1041,8 @@ class OptimizedEventDataStore:
             'batch_config': {
                 'batch_size': self.batch_config.batch_size,
                 'flush_interval': self.batch_config.flush_interval,
-                'max_buffer_size': self.batch_config.max_buffer_size
+                'max_buffer_size': self.batch_config.max_buffer_size,
+                'connection_pool_size': self.batch_config.connection_pool_size
             },
             'buffer_stats': buffer_stats,
             'processing_stats': self.stats.copy(),
@@ -3,7 +3,7 @@
 """
 
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import date
 
 # 导入数据模型（从weight模块）
@@ -28,17 +28,46 @@ class IWeightDataStore(ABC):
         """保存检测记录"""
         pass
 
+    @abstractmethod
+    def save_detection_records(self, records: List[WeightDetectionRecord], with_statistics: bool = False) -> bool:
+        """在一个事务内批量保存检测记录，with_statistics为True时在同一事务内累计日统计"""
+        pass
+
+    @abstractmethod
+    def persist_detection(self, record: WeightDetectionRecord) -> bool:
+        """在同一事务内保存检测记录并更新统计数据"""
+        pass
+
+    def flush(self) -> bool:
+        """将缓冲中的数据写入存储（无缓冲的实现无需重写）"""
+        return True
+
     @abstractmethod
     def get_recent_records(self, limit: int = 100) -> List[WeightDetectionRecord]:
         """获取最近的检测记录"""
         pass
 
+    @abstractmethod
+    def get_recent_records_before(self, timestamp_ns: int, limit: int) -> List[WeightDetectionRecord]:
+        """获取早于指定时间（unix纳秒）的最近检测记录"""
+        pass
+
     @abstractmethod
     def get_daily_statistics(self, target_date: date) -> List[WeightStatistics]:
         """获取指定日期的统计数据"""
         pass
 
+    @abstractmethod
+    def rebuild_daily(self, target_date: date) -> List[WeightStatistics]:
+        """由检测记录重新聚合指定日期的统计数据"""
+        pass
+
     @abstractmethod
     def update_statistics(self, record: WeightDetectionRecord):
         """更新统计数据"""
+        pass
+
+    @abstractmethod
+    def bulk_update_statistics(self, aggregated: Dict[Tuple[date, int], Tuple[int, float]]):
+        """按(日期, 分级)批量累计统计数据，值为(记录数, 重量总和)"""
         pass
\ No newline at end of file
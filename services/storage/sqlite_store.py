@@ -2,29 +2,251 @@
 SQLite数据存储实现
 """
 
+import json
+import os
 import sqlite3
 import threading
 import logging
-from datetime import datetime, date
-from typing import List, Optional
+import queue
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import replace
+from operator import attrgetter
+from datetime import datetime, date, time, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from ciso8601 import parse_datetime as _parse_iso  # C实现的ISO8601解析，比fromisoformat快一个数量级
+except ImportError:  # 未安装 ciso8601 时回退到标准库
+    _parse_iso = datetime.fromisoformat
 
 from .interfaces import IWeightDataStore
 from ..weight.models import WeightConfigSet, WeightGradeConfig, WeightDetectionRecord, WeightStatistics
 
 
+# 语句缓存容量：热路径SQL均为下方模块级常量，文本完全一致才能命中缓存
+STATEMENT_CACHE_SIZE = 256
+
+INSERT_CONFIG_SQL = (
+    "INSERT INTO weight_configs (grade_id, weight_threshold, kick_channel, enabled, description, version, "
+    "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+DELETE_CONFIGS_SQL = "DELETE FROM weight_configs"
+SELECT_CONFIGS_SQL = (
+    "SELECT grade_id, weight_threshold, kick_channel, enabled, description, version, created_at, updated_at "
+    "FROM weight_configs ORDER BY weight_threshold"
+)
+INSERT_RECORD_SQL = (
+    "INSERT INTO detection_records (timestamp, weight, determined_grade, kick_channel, detection_success) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+SELECT_LAST_ROWID_SQL = "SELECT last_insert_rowid()"
+SELECT_RECENT_RECORDS_SQL = (
+    "SELECT id, timestamp, weight, determined_grade, kick_channel, detection_success "
+    "FROM detection_records ORDER BY timestamp DESC LIMIT ?"
+)
+SELECT_RECORDS_BEFORE_SQL = (
+    "SELECT id, timestamp, weight, determined_grade, kick_channel, detection_success "
+    "FROM detection_records WHERE timestamp < ? ORDER BY timestamp DESC LIMIT ?"
+)
+SELECT_DAILY_STATISTICS_SQL = (
+    "SELECT grade_id, total_count, weight_sum, weight_avg FROM daily_statistics WHERE date = ? ORDER BY grade_id"
+)
+REBUILD_DAILY_STATISTICS_SQL = (
+    "SELECT determined_grade, COUNT(*), SUM(weight) FROM detection_records "
+    "WHERE timestamp >= ? AND timestamp < ? AND detection_success = 1 "
+    "GROUP BY determined_grade ORDER BY determined_grade"
+)
+UPSERT_STATISTICS_SQL = (
+    "INSERT INTO daily_statistics (date, grade_id, total_count, weight_sum, weight_avg) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT(date, grade_id) DO UPDATE SET "
+    "total_count = total_count + excluded.total_count, "
+    "weight_sum = weight_sum + excluded.weight_sum, "
+    "weight_avg = (weight_sum + excluded.weight_sum) / (total_count + excluded.total_count)"
+)
+SELECT_LOG_CHECKPOINT_SQL = "SELECT last_seq FROM pending_log_checkpoint WHERE id = 0"
+UPSERT_LOG_CHECKPOINT_SQL = (
+    "INSERT INTO pending_log_checkpoint (id, last_seq) VALUES (0, ?) "
+    "ON CONFLICT(id) DO UPDATE SET last_seq = excluded.last_seq"
+)
+
+# 每写入多少条检测记录重新ANALYZE一次，使查询计划跟随表规模更新
+ANALYZE_INTERVAL_ROWS = 100_000
+
+# 连续写入失败多少次后，逐条写入时不再区分错误类型，仍写不进去的记录一律隔离
+MAX_FLUSH_RETRIES = 5
+
+# 由记录内容本身引起、重试也不会成功的错误（如重量为NaN时绑定为NULL违反NOT NULL约束）
+_RECORD_ERRORS = (sqlite3.IntegrityError, sqlite3.DataError, sqlite3.InterfaceError, sqlite3.ProgrammingError,
+                  ValueError, TypeError, OverflowError)
+
+# 内存统计视图最多保留的天数
+MAX_CACHED_STATISTICS_DAYS = 7
+
+# 旧版本以ISO字符串存储的列：(表名, 列名, 旧列类型)
+LEGACY_TEXT_TIME_COLUMNS = (
+    ('detection_records', 'timestamp', 'TIMESTAMP'),
+    ('daily_statistics', 'date', 'DATE'),
+)
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# 缓冲日志以二进制追加写入，Windows下避免换行转换
+_LOG_OPEN_FLAGS = os.O_WRONLY | getattr(os, 'O_BINARY', 0)
+
+
+def _to_epoch_us(dt: datetime) -> int:
+    """datetime -> unix微秒整数（数据库存储格式）"""
+    return round(dt.timestamp() * 1_000_000)
+
+
+def _to_epoch_day(value: date) -> int:
+    """date -> 1970-01-01起的天数（数据库存储格式）"""
+    return value.toordinal() - _EPOCH_ORDINAL
+
+
+def _day_bounds_us(value: date) -> Tuple[int, int]:
+    """某日本地时间[0点, 次日0点)对应的unix微秒区间"""
+    start = datetime.combine(value, time.min)
+    return _to_epoch_us(start), _to_epoch_us(start + timedelta(days=1))
+
+
+def _record_row_factory(cursor: sqlite3.Cursor, row: tuple) -> WeightDetectionRecord:
+    """SELECT_RECENT_RECORDS_SQL的行 -> WeightDetectionRecord"""
+    return WeightDetectionRecord(row[0], row[1] * 1000, row[2], row[3], row[4], bool(row[5]))
+
+
+def _iso_to_epoch_us(value: Optional[str]) -> Optional[int]:
+    """迁移用：ISO时间字符串 -> unix微秒整数"""
+    return _to_epoch_us(_parse_iso(value)) if value is not None else None
+
+
+def _iso_to_epoch_day(value: Optional[str]) -> Optional[int]:
+    """迁移用：ISO日期字符串 -> 1970-01-01起的天数"""
+    return _to_epoch_day(date.fromisoformat(value)) if value is not None else None
+
+
+def _apply_pragmas(conn: sqlite3.Connection):
+    """设置连接级PRAGMA（WAL模式持久化在数据库文件中，重复设置开销很小）"""
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-20000")
+    conn.execute("PRAGMA busy_timeout=5000")
+
+
 class SQLiteWeightDataStore(IWeightDataStore):
     """基于SQLite的重量数据存储实现"""
 
-    def __init__(self, db_path: str = "weight_detection.db"):
+    def __init__(self, db_path: str = "weight_detection.db", batch_size: int = 64, flush_interval: float = 0.5,
+                 read_pool_size: int = 4, write_pool_size: int = 2, pending_log_path: Optional[str] = None):
         self.db_path = db_path
-        self.lock = threading.Lock()
-        self._init_database()
         self.logger = logging.getLogger(__name__)
 
+        # 读写连接池（LIFO，保持最近使用连接的页缓存热度）
+        # 写事务以BEGIN IMMEDIATE开始，由SQLite写锁 + busy_timeout串行化，不再需要Python层的锁
+        self._write_pool: queue.LifoQueue = queue.LifoQueue(maxsize=max(1, write_pool_size))
+        self._read_pool: queue.LifoQueue = queue.LifoQueue(maxsize=max(1, read_pool_size))
+
+        self._init_database()
+
+        # 日统计内存视图：日期首次查询时由统计表与写缓冲载入，之后随写入增量维护，查询不再访问数据库。
+        # _stats_loaded记录各日期载入时的缓冲日志序号，序号不大于它的记录已计入视图
+        self._stats_cache: Dict[Tuple[date, int], WeightStatistics] = {}
+        self._stats_loaded: Dict[date, int] = {}
+        self._stats_lock = threading.Lock()
+
+        # 检测记录写缓冲：达到batch_size或超过flush_interval秒后批量写入
+        # 元素为(记录, 是否同时累计日统计, 缓冲日志序号)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: List[Tuple[WeightDetectionRecord, bool, int]] = []
+        # 写入线程已取出、尚未提交完成的批次，读取最近记录时与缓冲一并合并
+        self._inflight: List[Tuple[WeightDetectionRecord, bool, int]] = []
+        self._next_seq = 1
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flush_event = threading.Event()
+        self._failed_flushes = 0
+        self._rows_since_analyze = 0
+
+        # 写缓冲的追加日志：入队时以O_APPEND直接写入，批量写入前整批fsync一次（组提交），提交后重写为仅含未提交记录；
+        # 进程被杀时已写入的日志仍由操作系统落盘，只有断电/系统崩溃时可能丢失最近一批尚未fsync的记录，
+        # 与数据库WAL + synchronous=NORMAL下最近提交的持久性相同，换取入队路径不再有同步磁盘等待；
+        # 每行带递增序号，已提交的最大序号与记录在同一事务内写入pending_log_checkpoint，
+        # 进程异常退出后启动时只重放序号大于检查点的记录
+        self.pending_log_path = pending_log_path or str(Path(db_path).with_suffix('.pending.log'))
+        # 隔离日志：无法写入数据库的记录移到这里，不再阻塞写缓冲
+        self.rejected_log_path = str(Path(db_path).with_suffix('.rejected.log'))
+        self._replay_pending_log()
+        self._log_fd = os.open(self.pending_log_path, _LOG_OPEN_FLAGS | os.O_APPEND | os.O_CREAT, 0o644)
+        with self._pending_lock:
+            self._rewrite_log()
+        self.flush()
+
+        self._running = True
+        self._flush_thread = threading.Thread(target=self._flush_worker, name="WeightRecordFlush", daemon=True)
+        self._flush_thread.start()
+
+    def _create_write_connection(self) -> sqlite3.Connection:
+        """创建写连接"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        _apply_pragmas(conn)
+        return conn
+
+    def _create_read_connection(self) -> sqlite3.Connection:
+        """创建只读连接"""
+        uri = f"{Path(self.db_path).resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        _apply_pragmas(conn)
+        conn.execute("PRAGMA query_only=1")
+        return conn
+
+    @staticmethod
+    @contextmanager
+    def _borrow(pool: queue.LifoQueue, create):
+        """从连接池借出连接，用完归还；池已满时关闭多余连接"""
+        try:
+            conn = pool.get_nowait()
+        except queue.Empty:
+            conn = create()
+        try:
+            yield conn
+        except BaseException:
+            # 出错的连接状态未知，直接关闭不放回池中
+            conn.close()
+            raise
+        try:
+            pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _acquire_read(self):
+        """借出只读连接"""
+        return self._borrow(self._read_pool, self._create_read_connection)
+
+    @contextmanager
+    def _write_transaction(self):
+        """借出写连接执行一个事务，异常时回滚"""
+        with self._borrow(self._write_pool, self._create_write_connection) as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield cursor
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+
     def _init_database(self):
         """初始化数据库表结构"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        with self._write_transaction() as cursor:
+            cursor.connection.create_function('iso_to_epoch_us', 1, _iso_to_epoch_us, deterministic=True)
+            cursor.connection.create_function('iso_to_epoch_day', 1, _iso_to_epoch_day, deterministic=True)
+            legacy_tables = self._rename_legacy_tables(cursor)
 
             # 配置表
             cursor.execute('''
@@ -74,7 +296,7 @@ class SQLiteWeightDataStore(IWeightDataStore):
                                KEY
                                AUTOINCREMENT,
                                timestamp
-                               TIMESTAMP
+                               INTEGER
                                NOT
                                NULL,
                                weight
@@ -108,7 +330,7 @@ class SQLiteWeightDataStore(IWeightDataStore):
                                KEY
                                AUTOINCREMENT,
                                date
-                               DATE
+                               INTEGER
                                NOT
                                NULL,
                                grade_id
@@ -141,37 +363,93 @@ class SQLiteWeightDataStore(IWeightDataStore):
                                )
                            ''')
 
-            # 创建索引
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_records_timestamp ON detection_records(timestamp)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_statistics_date ON daily_statistics(date)')
+            # 缓冲日志检查点：最后一条已提交记录的日志序号
+            cursor.execute('''
+                           CREATE TABLE IF NOT EXISTS pending_log_checkpoint
+                           (
+                               id
+                               INTEGER
+                               PRIMARY
+                               KEY,
+                               last_seq
+                               INTEGER
+                               NOT
+                               NULL
+                           )
+                           ''')
+
+            self._import_legacy_tables(cursor, legacy_tables)
+
+            # 创建覆盖索引：最近记录查询与日统计查询只走索引，不回表
+            cursor.execute('''
+                           CREATE INDEX IF NOT EXISTS idx_records_ts_covering
+                               ON detection_records (timestamp DESC, id, weight, determined_grade, kick_channel,
+                                                     detection_success)
+                           ''')
+            cursor.execute('''
+                           CREATE INDEX IF NOT EXISTS idx_stats_cov
+                               ON daily_statistics (date, grade_id, total_count, weight_sum, weight_avg)
+                           ''')
+            # 被覆盖索引取代的旧索引，保留只会增加写入开销
+            cursor.execute('DROP INDEX IF EXISTS idx_records_timestamp')
+            cursor.execute('DROP INDEX IF EXISTS idx_statistics_date')
+
+            # 按需更新查询规划器的统计信息
+            cursor.execute('PRAGMA optimize')
+
+    @staticmethod
+    def _rename_legacy_tables(cursor: sqlite3.Cursor) -> List[str]:
+        """时间列仍为ISO字符串的旧表改名保留，待新表建好后导入"""
+        legacy_tables = []
+        for table, column, legacy_type in LEGACY_TEXT_TIME_COLUMNS:
+            row = cursor.execute('SELECT type FROM pragma_table_info(?) WHERE name = ?', (table, column)).fetchone()
+            if row and row[0].upper() == legacy_type:
+                cursor.execute(f'ALTER TABLE {table} RENAME TO {table}_legacy')
+                legacy_tables.append(table)
+        return legacy_tables
+
+    def _import_legacy_tables(self, cursor: sqlite3.Cursor, legacy_tables: List[str]):
+        """将旧表数据转换为整数时间格式导入新表，然后删除旧表"""
+        if 'detection_records' in legacy_tables:
+            cursor.execute('''
+                           INSERT INTO detection_records
+                               (id, timestamp, weight, determined_grade, kick_channel, detection_success)
+                           SELECT id, iso_to_epoch_us(timestamp), weight, determined_grade, kick_channel,
+                                  detection_success
+                           FROM detection_records_legacy
+                           ''')
+        if 'daily_statistics' in legacy_tables:
+            cursor.execute('''
+                           INSERT INTO daily_statistics (id, date, grade_id, total_count, weight_sum, weight_avg)
+                           SELECT id, iso_to_epoch_day(date), grade_id, total_count, weight_sum, weight_avg
+                           FROM daily_statistics_legacy
+                           ''')
 
-            conn.commit()
+        for table in legacy_tables:
+            cursor.execute(f'DROP TABLE {table}_legacy')
+            self.logger.info(f"{table} 时间列已迁移为整数格式")
 
     def save_config(self, config_set: WeightConfigSet) -> bool:
         """保存配置"""
         try:
-            with self.lock:
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.cursor()
-
-                    # 删除旧配置
-                    cursor.execute('DELETE FROM weight_configs')
-
-                    # 插入新配置
-                    for config in config_set.configs:
-                        cursor.execute('''
-                                       INSERT INTO weight_configs
-                                       (grade_id, weight_threshold, kick_channel, enabled, description, version,
-                                        created_at, updated_at)
-                                       VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                                       ''', (
-                                           config.grade_id, config.weight_threshold, config.kick_channel,
-                                           config.enabled, config.description, config_set.version,
-                                           config_set.created_at.isoformat(), config_set.updated_at.isoformat()
-                                       ))
-
-                    conn.commit()
-                    return True
+            # 整个配置集共用版本和时间，只格式化一次
+            version = config_set.version
+            created_iso = config_set.created_at.isoformat()
+            updated_iso = config_set.updated_at.isoformat()
+            rows = [
+                (config.grade_id, config.weight_threshold, config.kick_channel, config.enabled,
+                 config.description, version, created_iso, updated_iso)
+                for config in config_set.configs
+            ]
+
+            with self._write_transaction() as cursor:
+                # 删除旧配置
+                cursor.execute(DELETE_CONFIGS_SQL)
+
+                # 插入新配置
+                cursor.executemany(INSERT_CONFIG_SQL, rows)
+
+            return True
         except Exception as e:
             self.logger.error(f"保存配置失败: {e}")
             return False
@@ -179,20 +457,9 @@ class SQLiteWeightDataStore(IWeightDataStore):
     def load_config(self) -> Optional[WeightConfigSet]:
         """加载配置"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._acquire_read() as conn:
                 cursor = conn.cursor()
-                cursor.execute('''
-                               SELECT grade_id,
-                                      weight_threshold,
-                                      kick_channel,
-                                      enabled,
-                                      description,
-                                      version,
-                                      created_at,
-                                      updated_at
-                               FROM weight_configs
-                               ORDER BY weight_threshold
-                               ''')
+                cursor.execute(SELECT_CONFIGS_SQL)
 
                 rows = cursor.fetchall()
                 if not rows:
@@ -212,8 +479,8 @@ class SQLiteWeightDataStore(IWeightDataStore):
                         description=row[4] or ""
                     ))
                     version = row[5]
-                    created_at = datetime.fromisoformat(row[6]) if row[6] else created_at
-                    updated_at = datetime.fromisoformat(row[7]) if row[7] else updated_at
+                    created_at = _parse_iso(row[6]) if row[6] else created_at
+                    updated_at = _parse_iso(row[7]) if row[7] else updated_at
 
                 return WeightConfigSet(
                     configs=configs,
@@ -226,126 +493,486 @@ class SQLiteWeightDataStore(IWeightDataStore):
             return None
 
     def save_detection_record(self, record: WeightDetectionRecord) -> bool:
-        """保存检测记录"""
+        """保存检测记录（写入缓冲，record.id在批量写入后回填）"""
+        self._enqueue(record, False)
+        return True
+
+    def save_detection_records(self, records: List[WeightDetectionRecord], with_statistics: bool = False) -> bool:
+        """
+        批量保存检测记录（整批写入缓冲，随下一次批量写入在同一事务内提交）
+        with_statistics为True时各记录的日统计也在该事务内累计
+        """
+        with self._pending_lock:
+            first_seq = self._append_pending([(record, with_statistics) for record in records])
+            pending_count = len(self._pending)
+        if with_statistics:
+            with self._stats_lock:
+                for seq, record in enumerate(records, first_seq):
+                    self._cache_statistics(record, seq)
+
+        if pending_count >= self.batch_size:
+            self._flush_event.set()
+        return True
+
+    def persist_detection(self, record: WeightDetectionRecord) -> bool:
+        """保存检测记录，检测成功时在同一事务内累计日统计"""
+        self._enqueue(record, record.detection_success)
+        return True
+
+    def _enqueue(self, record: WeightDetectionRecord, with_statistics: bool):
+        """记录加入写缓冲，达到批量大小时唤醒写入线程"""
+        with self._pending_lock:
+            seq = self._append_pending([(record, with_statistics)])
+            pending_count = len(self._pending)
+        if with_statistics:
+            with self._stats_lock:
+                self._cache_statistics(record, seq)
+
+        if pending_count >= self.batch_size:
+            self._flush_event.set()
+
+    @staticmethod
+    def _log_line(record: WeightDetectionRecord, with_statistics: bool, seq: int) -> str:
+        """缓冲日志的一行：[序号, 时间(微秒), 重量, 分级, 通道, 是否成功, 是否累计日统计]"""
+        return json.dumps([seq, record.timestamp_ns // 1000, record.weight, record.determined_grade,
+                           record.kick_channel, record.detection_success, with_statistics]) + '\n'
+
+    def _append_pending(self, entries: List[Tuple[WeightDetectionRecord, bool]]) -> int:
+        """记录分配序号后追加写入日志（不fsync），再加入写缓冲，返回第一条的序号（调用方持有_pending_lock）"""
+        first_seq = self._next_seq
+        lines = []
+        pending = []
+        for record, with_statistics in entries:
+            seq = self._next_seq
+            self._next_seq += 1
+            lines.append(self._log_line(record, with_statistics, seq))
+            pending.append((record, with_statistics, seq))
+        # 日志写入后才算入队：此后进程被杀，记录仍可在下次启动时重放
+        os.write(self._log_fd, ''.join(lines).encode('utf-8'))
+        self._pending.extend(pending)
+        return first_seq
+
+    def _rewrite_log(self):
+        """已提交的记录从日志中移除，只保留缓冲中的记录；先写临时文件再替换（调用方持有_pending_lock）"""
+        tmp_path = self.pending_log_path + '.tmp'
+        fd = os.open(tmp_path, _LOG_OPEN_FLAGS | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            if self._pending:
+                os.write(fd, ''.join(self._log_line(*entry) for entry in self._pending).encode('utf-8'))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.close(self._log_fd)
         try:
-            with self.lock:
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute('''
-                                   INSERT INTO detection_records
-                                       (timestamp, weight, determined_grade, kick_channel, detection_success)
-                                   VALUES (?, ?, ?, ?, ?)
-                                   ''', (
-                                       record.timestamp.isoformat(), record.weight, record.determined_grade,
-                                       record.kick_channel, record.detection_success
-                                   ))
-
-                    # 获取插入的记录ID
-                    record.id = cursor.lastrowid
-                    conn.commit()
+            os.replace(tmp_path, self.pending_log_path)
+        finally:
+            self._log_fd = os.open(self.pending_log_path, _LOG_OPEN_FLAGS | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def _load_log_checkpoint(self) -> int:
+        """读取已提交的最大日志序号"""
+        with self._acquire_read() as conn:
+            row = conn.execute(SELECT_LOG_CHECKPOINT_SQL).fetchone()
+        return row[0] if row else 0
+
+    def _replay_pending_log(self):
+        """载入上次未写入数据库的缓冲记录，跳过序号不大于检查点（已提交）的记录"""
+        try:
+            with open(self.pending_log_path, encoding='utf-8') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+
+        checkpoint = self._load_log_checkpoint()
+        last_seq = checkpoint
+        entries = []
+        skipped = 0
+        for line in lines:
+            try:
+                fields = json.loads(line)
+                # 旧版本的日志行没有序号
+                seq = fields.pop(0) if len(fields) == 7 else None
+                ts, weight, grade, channel, success, with_statistics = fields
+            except (ValueError, TypeError, AttributeError):
+                # 进程在写入过程中退出时最后一行可能不完整
+                self.logger.warning(f"跳过无法解析的缓冲日志行: {line!r}")
+                continue
+            if seq is not None:
+                if seq <= checkpoint:
+                    skipped += 1
+                    continue
+                last_seq = max(last_seq, seq)
+            record = WeightDetectionRecord(None, ts * 1000, weight, grade, channel, success)
+            entries.append((record, with_statistics, seq))
+
+        self._next_seq = last_seq + 1
+        for record, with_statistics, seq in entries:
+            if seq is None:
+                seq = self._next_seq
+                self._next_seq += 1
+            self._pending.append((record, with_statistics, seq))
+
+        if skipped:
+            self.logger.info(f"缓冲日志中{skipped}条记录已提交，跳过重放")
+        if self._pending:
+            self.logger.info(f"从缓冲日志恢复{len(self._pending)}条检测记录")
+
+    def _flush_worker(self):
+        """后台批量写入线程"""
+        while self._running:
+            self._flush_event.wait(self.flush_interval)
+            self._flush_event.clear()
+            self.flush()
+
+    def flush(self) -> bool:
+        """将缓冲中的检测记录及其统计在一个事务内批量写入；整批失败时逐条写入，隔离写不进去的记录"""
+        with self._flush_lock:
+            with self._pending_lock:
+                if not self._pending:
                     return True
+                pending, self._pending = self._pending, []
+                self._inflight = pending
+
+            # 组提交：本批次入队时写入的日志行在这里一次fsync（日志只由写入线程在持有_flush_lock时重写，fd不会被替换）
+            try:
+                os.fsync(self._log_fd)
+            except OSError as e:
+                self.logger.warning(f"缓冲日志fsync失败: {e}")
+
+            try:
+                self._commit_entries(pending)
+                remaining = []
+            except Exception as e:
+                self.logger.error(f"批量保存检测记录失败({len(pending)}条)，改为逐条写入: {e}")
+                remaining = self._commit_one_by_one(pending)
+
+            with self._pending_lock:
+                # 未写入的记录放回缓冲头部等待下次写入
+                self._pending[:0] = remaining
+                self._inflight = []
+                if len(remaining) < len(pending):
+                    # 已提交/已隔离的记录从日志中移除，只保留缓冲中的记录
+                    try:
+                        self._rewrite_log()
+                    except OSError as e:
+                        # 已提交的记录由检查点跳过，日志暂不重写不影响恢复
+                        self.logger.warning(f"重写缓冲日志失败: {e}")
+
+            if remaining:
+                self._failed_flushes += 1
+                self.logger.error(f"{len(remaining)}条检测记录等待重试（连续失败{self._failed_flushes}次）")
+                return False
+            self._failed_flushes = 0
+
+            self._rows_since_analyze += len(pending)
+            if self._rows_since_analyze >= ANALYZE_INTERVAL_ROWS:
+                self._rows_since_analyze = 0
+                self._analyze()
+            return True
+
+    def _commit_entries(self, entries: List[Tuple[WeightDetectionRecord, bool, int]]):
+        """在一个事务内写入一组缓冲记录及其统计增量，提交后回填record.id（调用方持有_flush_lock）"""
+        # 一次遍历生成记录行，同时按(日期, 分级)合并统计增量，每组只执行一次UPSERT。
+        # 一个批次通常只跨越一两秒，本地日期按秒缓存，不必每条记录都换算
+        rows = []
+        grouped = defaultdict(lambda: [0, 0.0])
+        epoch_days = {}
+        for record, with_statistics, _ in entries:
+            rows.append((record.timestamp_ns // 1000, record.weight, record.determined_grade,
+                         record.kick_channel, record.detection_success))
+            if with_statistics:
+                second = record.timestamp_ns // 1_000_000_000
+                epoch_day = epoch_days.get(second)
+                if epoch_day is None:
+                    epoch_day = epoch_days[second] = _to_epoch_day(date.fromtimestamp(second))
+                group = grouped[(epoch_day, record.determined_grade)]
+                group[0] += 1
+                group[1] += record.weight
+        statistics_rows = [
+            (epoch_day, grade_id, count, weight_sum, weight_sum / count)
+            for (epoch_day, grade_id), (count, weight_sum) in grouped.items()
+        ]
+
+        with self._write_transaction() as cursor:
+            cursor.executemany(INSERT_RECORD_SQL, rows)
+            # executemany不更新lastrowid，同一事务内的自增ID连续，由最后一条反推
+            last_id = cursor.execute(SELECT_LAST_ROWID_SQL).fetchone()[0]
+            if statistics_rows:
+                cursor.executemany(UPSERT_STATISTICS_SQL, statistics_rows)
+            # 检查点与记录一同提交：日志重写前进程退出时，重放会跳过本批次
+            cursor.execute(UPSERT_LOG_CHECKPOINT_SQL, (entries[-1][2],))
+
+        first_id = last_id - len(entries) + 1
+        for i, (record, _, _) in enumerate(entries):
+            record.id = first_id + i
+
+    def _commit_one_by_one(self, entries: List[Tuple[WeightDetectionRecord, bool, int]]
+                           ) -> List[Tuple[WeightDetectionRecord, bool, int]]:
+        """
+        逐条写入整批失败的记录，返回需要重试的记录（调用方持有_flush_lock）
+        由记录内容引起的错误直接隔离该条；其他错误（如数据库被锁、磁盘满）停止写入，剩余记录按序重试，
+        连续失败达到MAX_FLUSH_RETRIES次后不再区分错误类型，仍写不进去的记录一律隔离，避免阻塞后续记录
+        """
+        isolate_all = self._failed_flushes + 1 >= MAX_FLUSH_RETRIES
+        rejected = []
+        remaining = []
+        for i, entry in enumerate(entries):
+            try:
+                self._commit_entries([entry])
+            except _RECORD_ERRORS as e:
+                rejected.append((entry, e))
+            except Exception as e:
+                if not isolate_all:
+                    remaining = entries[i:]
+                    break
+                rejected.append((entry, e))
+
+        if rejected:
+            self._quarantine(rejected)
+        return remaining
+
+    def _quarantine(self, rejected: List[Tuple[Tuple[WeightDetectionRecord, bool, int], Exception]]):
+        """写不进去的记录追加到隔离日志（格式同缓冲日志，可人工修正后导入），不再重试（调用方持有_flush_lock）"""
+        for (record, _, seq), error in rejected:
+            self.logger.error(f"检测记录无法写入，移入隔离日志 {self.rejected_log_path}: 序号{seq}, {record}, {error}")
+        try:
+            with open(self.rejected_log_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(self._log_line(*entry) for entry, _ in rejected))
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            self.logger.error(f"写入隔离日志失败，{len(rejected)}条记录丢弃: {e}")
+
+        # 这些记录的日统计增量入队时已计入内存视图，而统计表中没有，清空视图待查询时重新载入
+        if any(with_statistics for (_, with_statistics, _), _ in rejected):
+            with self._stats_lock:
+                self._stats_loaded.clear()
+                self._stats_cache.clear()
+
+    def _analyze(self):
+        """重新收集检测记录表的统计信息"""
+        try:
+            with self._write_transaction() as cursor:
+                cursor.execute('ANALYZE detection_records')
         except Exception as e:
-            self.logger.error(f"保存检测记录失败: {e}")
-            return False
+            self.logger.warning(f"ANALYZE失败: {e}")
+
+    def close(self):
+        """停止后台写入线程，写入剩余记录并关闭连接"""
+        if not self._running:
+            return
+        self._running = False
+        self._flush_event.set()
+        self._flush_thread.join(timeout=5.0)
+        self.flush()
+        os.close(self._log_fd)
+
+        for pool in (self._write_pool, self._read_pool):
+            while True:
+                try:
+                    conn = pool.get_nowait()
+                except queue.Empty:
+                    break
+                if pool is self._write_pool:
+                    # SQLite建议在关闭连接前执行，按本连接的查询历史更新统计信息
+                    conn.execute("PRAGMA optimize")
+                conn.close()
 
     def get_recent_records(self, limit: int = 100) -> List[WeightDetectionRecord]:
-        """获取最近的检测记录"""
+        """获取最近的检测记录（含写缓冲中尚未写入的记录，其id为写入前的值）"""
+        return self._read_recent(SELECT_RECENT_RECORDS_SQL, (limit,), limit)
+
+    def get_recent_records_before(self, timestamp_ns: int, limit: int) -> List[WeightDetectionRecord]:
+        """获取早于指定时间（unix纳秒）的最近检测记录（走时间覆盖索引的区间扫描）"""
+        return self._read_recent(SELECT_RECORDS_BEFORE_SQL, (timestamp_ns // 1000, limit), limit, timestamp_ns)
+
+    def _read_recent(self, sql: str, params: tuple, limit: int,
+                     before_ns: Optional[int] = None) -> List[WeightDetectionRecord]:
+        """
+        读取已提交的最近记录并与写缓冲合并，读路径不触发写入。
+        先取缓冲快照再读库，检查点与记录在同一读事务内读取：序号不大于检查点的缓冲记录已在读到的结果中
+        """
+        with self._pending_lock:
+            buffered = self._inflight + self._pending
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._acquire_read() as conn:
+                # row_factory只设在本次游标上，不影响池中连接的其他查询
                 cursor = conn.cursor()
-                cursor.execute('''
-                               SELECT id, timestamp, weight, determined_grade, kick_channel, detection_success
-                               FROM detection_records
-                               ORDER BY timestamp DESC
-                                   LIMIT ?
-                               ''', (limit,))
-
-                rows = cursor.fetchall()
-                records = []
-
-                for row in rows:
-                    records.append(WeightDetectionRecord(
-                        id=row[0],
-                        timestamp=datetime.fromisoformat(row[1]),
-                        weight=row[2],
-                        determined_grade=row[3],
-                        kick_channel=row[4],
-                        detection_success=bool(row[5])
-                    ))
-
-                return records
+                cursor.row_factory = _record_row_factory
+                cursor.execute("BEGIN")
+                records = cursor.execute(sql, params).fetchall()
+                checkpoint = conn.execute(SELECT_LOG_CHECKPOINT_SQL).fetchone()
+                cursor.execute("COMMIT")
         except Exception as e:
             self.logger.error(f"获取检测记录失败: {e}")
             return []
 
+        last_seq = checkpoint[0] if checkpoint else 0
+        unsaved = [
+            replace(record) for record, _, seq in buffered
+            if seq > last_seq and (before_ns is None or record.timestamp_ns < before_ns)
+        ]
+        if unsaved:
+            records.extend(unsaved)
+            records.sort(key=attrgetter('timestamp_ns'), reverse=True)
+            del records[limit:]
+        return records
+
     def get_daily_statistics(self, target_date: date) -> List[WeightStatistics]:
         """获取指定日期的统计数据"""
+        with self._stats_lock:
+            loaded = target_date in self._stats_loaded
+        if not loaded and not self._load_statistics_view(target_date):
+            return []
+
+        with self._stats_lock:
+            statistics = [replace(stats) for key, stats in self._stats_cache.items() if key[0] == target_date]
+
+        statistics.sort(key=lambda stats: stats.grade_id)
+        return statistics
+
+    def _load_statistics_view(self, target_date: date) -> bool:
+        """
+        载入某日的内存统计视图：统计表中已提交的部分加上写缓冲中尚未写入的部分。
+        统计表的写入（批量写入与直接累计）都持有_flush_lock，持有它期间统计表不变，
+        读库时不持有_stats_lock，检测线程入队不受影响（检测记录与其统计可能分开写入，不能由检测记录重建视图）
+        """
+        with self._flush_lock:
+            with self._stats_lock:
+                if target_date in self._stats_loaded:
+                    return True
+
+            statistics = self._load_daily_statistics(target_date)
+            if statistics is None:
+                return False
+
+            by_grade = {stats.grade_id: stats for stats in statistics}
+            with self._stats_lock:
+                with self._pending_lock:
+                    seed_seq = self._next_seq - 1
+                    for record, with_statistics, _ in self._pending:
+                        if with_statistics and record.detection_date == target_date:
+                            stats = by_grade.get(record.determined_grade)
+                            if stats is None:
+                                stats = by_grade[record.determined_grade] = WeightStatistics(
+                                    date=target_date, grade_id=record.determined_grade)
+                            stats.add_record(record.weight)
+                self._remember_statistics(target_date, list(by_grade.values()), seed_seq)
+            return True
+
+    def _load_daily_statistics(self, target_date: date) -> Optional[List[WeightStatistics]]:
+        """从统计表读取指定日期的统计数据（走覆盖索引），失败返回None"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._acquire_read() as conn:
                 cursor = conn.cursor()
-                cursor.execute('''
-                               SELECT date, grade_id, total_count, weight_sum, weight_avg
-                               FROM daily_statistics
-                               WHERE date = ?
-                               ORDER BY grade_id
-                               ''', (target_date.isoformat(),))
-
-                rows = cursor.fetchall()
-                statistics = []
+                cursor.execute(SELECT_DAILY_STATISTICS_SQL, (_to_epoch_day(target_date),))
+
+                return [
+                    WeightStatistics(
+                        date=target_date,
+                        grade_id=grade_id,
+                        total_count=total_count,
+                        weight_sum=weight_sum,
+                        weight_avg=weight_avg
+                    )
+                    for grade_id, total_count, weight_sum, weight_avg in cursor.fetchall()
+                ]
+        except Exception as e:
+            self.logger.error(f"获取统计数据失败: {e}")
+            return None
 
-                for row in rows:
-                    statistics.append(WeightStatistics(
-                        date=date.fromisoformat(row[0]),
-                        grade_id=row[1],
-                        total_count=row[2],
-                        weight_sum=row[3],
-                        weight_avg=row[4]
-                    ))
+    def rebuild_daily(self, target_date: date) -> List[WeightStatistics]:
+        """由检测记录重新聚合指定日期的统计数据（不依赖daily_statistics表）"""
+        self.flush()
+        return self._aggregate_daily(target_date) or []
 
-                return statistics
+    def _aggregate_daily(self, target_date: date) -> Optional[List[WeightStatistics]]:
+        """在SQL内按分级聚合指定日期的成功检测记录（走时间覆盖索引），失败返回None"""
+        try:
+            with self._acquire_read() as conn:
+                cursor = conn.cursor()
+                cursor.execute(REBUILD_DAILY_STATISTICS_SQL, _day_bounds_us(target_date))
+
+                return [
+                    WeightStatistics(
+                        date=target_date,
+                        grade_id=grade_id,
+                        total_count=total_count,
+                        weight_sum=weight_sum,
+                        weight_avg=weight_sum / total_count
+                    )
+                    for grade_id, total_count, weight_sum in cursor.fetchall()
+                ]
         except Exception as e:
-            self.logger.error(f"获取统计数据失败: {e}")
-            return []
+            self.logger.error(f"重建统计数据失败: {e}")
+            return None
+
+    def _remember_statistics(self, target_date: date, statistics: List[WeightStatistics], seed_seq: int):
+        """将某日统计放入内存视图，超出保留天数时淘汰最早载入的日期（调用方持有_stats_lock）"""
+        self._stats_loaded[target_date] = seed_seq
+        for stats in statistics:
+            self._stats_cache[(target_date, stats.grade_id)] = stats
+
+        while len(self._stats_loaded) > MAX_CACHED_STATISTICS_DAYS:
+            self._forget_statistics(next(iter(self._stats_loaded)))
+
+    def _forget_statistics(self, target_date: date):
+        """从内存视图移除某日统计，下次查询时重新载入（调用方持有_stats_lock）"""
+        self._stats_loaded.pop(target_date, None)
+        for key in [key for key in self._stats_cache if key[0] == target_date]:
+            del self._stats_cache[key]
+
+    def _cache_statistics(self, record: WeightDetectionRecord, seq: Optional[int] = None):
+        """
+        将记录累计到内存视图，未载入的日期跳过（调用方持有_stats_lock）
+        seq为缓冲记录的日志序号，不大于载入时序号的记录已在载入时计入
+        """
+        record_date = record.detection_date
+        seed_seq = self._stats_loaded.get(record_date)
+        if seed_seq is None or (seq is not None and seq <= seed_seq):
+            return
+
+        key = (record_date, record.determined_grade)
+        stats = self._stats_cache.get(key)
+        if stats is None:
+            stats = self._stats_cache[key] = WeightStatistics(date=record_date, grade_id=record.determined_grade)
+        stats.add_record(record.weight)
+
+    def _cache_group(self, record_date: date, grade_id: int, count: int, weight_sum: float):
+        """将一组合并后的记录累计到内存视图，未载入的日期跳过（调用方持有_stats_lock）"""
+        if record_date not in self._stats_loaded:
+            return
+
+        key = (record_date, grade_id)
+        stats = self._stats_cache.get(key)
+        if stats is None:
+            stats = self._stats_cache[key] = WeightStatistics(date=record_date, grade_id=grade_id)
+        stats.add_records(count, weight_sum)
 
     def update_statistics(self, record: WeightDetectionRecord):
         """更新统计数据"""
         try:
-            with self.lock:
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.cursor()
-                    record_date = record.timestamp.date()
-
-                    # 检查是否已存在该日期和分级的统计记录
-                    cursor.execute('''
-                                   SELECT total_count, weight_sum
-                                   FROM daily_statistics
-                                   WHERE date = ? AND grade_id = ?
-                                   ''', (record_date.isoformat(), record.determined_grade))
-
-                    existing = cursor.fetchone()
-
-                    if existing:
-                        # 更新现有记录
-                        new_count = existing[0] + 1
-                        new_sum = existing[1] + record.weight
-                        new_avg = new_sum / new_count
-
-                        cursor.execute('''
-                                       UPDATE daily_statistics
-                                       SET total_count = ?,
-                                           weight_sum  = ?,
-                                           weight_avg  = ?
-                                       WHERE date = ? AND grade_id = ?
-                                       ''',
-                                       (new_count, new_sum, new_avg, record_date.isoformat(), record.determined_grade))
-                    else:
-                        # 创建新记录
-                        cursor.execute('''
-                                       INSERT INTO daily_statistics (date, grade_id, total_count, weight_sum, weight_avg)
-                                       VALUES (?, ?, ?, ?, ?)
-                                       ''', (record_date.isoformat(), record.determined_grade, 1, record.weight,
-                                             record.weight))
-
-                    conn.commit()
+            with self._flush_lock, self._stats_lock:
+                with self._write_transaction() as cursor:
+                    cursor.execute(UPSERT_STATISTICS_SQL, (
+                        _to_epoch_day(record.detection_date), record.determined_grade, 1, record.weight, record.weight
+                    ))
+                self._cache_statistics(record)
+        except Exception as e:
+            self.logger.error(f"更新统计数据失败: {e}")
+
+    def bulk_update_statistics(self, aggregated: Dict[Tuple[date, int], Tuple[int, float]]):
+        """按(日期, 分级)批量累计统计数据，所有分组在一个事务内UPSERT"""
+        if not aggregated:
+            return
+        rows = [
+            (_to_epoch_day(record_date), grade_id, count, weight_sum, weight_sum / count)
+            for (record_date, grade_id), (count, weight_sum) in aggregated.items()
+        ]
+        try:
+            with self._flush_lock, self._stats_lock:
+                with self._write_transaction() as cursor:
+                    cursor.executemany(UPSERT_STATISTICS_SQL, rows)
+                for (record_date, grade_id), (count, weight_sum) in aggregated.items():
+                    self._cache_group(record_date, grade_id, count, weight_sum)
         except Exception as e:
-            self.logger.error(f"更新统计数据失败: {e}")
\ No newline at end of file
+            self.logger.error(f"批量更新统计数据失败({len(aggregated)}组): {e}")
\ No newline at end of file
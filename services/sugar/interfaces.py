@@ -17,6 +17,16 @@ class ISugarDataStore(ABC):
         """保存检测记录"""
         pass
 
+    @abstractmethod
+    def save_detection_records(self, records: List[SugarDetectionRecord]) -> bool:
+        """在一个事务内批量保存检测记录"""
+        pass
+
+    @abstractmethod
+    def persist_detection(self, record: SugarDetectionRecord) -> bool:
+        """在同一事务内保存检测记录并更新统计数据"""
+        pass
+
     @abstractmethod
     def get_recent_records(self, limit: int = 100) -> List[SugarDetectionRecord]:
         """获取最近的检测记录"""
@@ -27,6 +37,11 @@ class ISugarDataStore(ABC):
         """获取指定日期的统计数据"""
         pass
 
+    @abstractmethod
+    def rebuild_daily(self, target_date: date) -> Optional[SugarStatistics]:
+        """由检测记录重新聚合指定日期的统计数据，失败返回None"""
+        pass
+
     @abstractmethod
     def update_statistics(self, record: SugarDetectionRecord):
         """更新统计数据"""
@@ -18,11 +18,11 @@ class SugarDetectionStatus(Enum):
     ERROR = "error"
 
 
-@dataclass
+@dataclass(slots=True)
 class SugarDetectionRecord:
     """糖度检测记录"""
     id: int
-    timestamp: datetime
+    timestamp_ns: int  # 检测时间（unix纳秒），读取timestamp时才转换为datetime
     sugar_content: float  # 糖度值
     acid_content: Optional[float] = None  # 酸度值
     serial_number: Optional[int] = None  # 流水号
@@ -33,8 +33,13 @@ class SugarDetectionRecord:
         if self.sugar_content < 0:
             raise ValueError("糖度值不能为负数")
 
+    @property
+    def timestamp(self) -> datetime:
+        """检测时间"""
+        return datetime.fromtimestamp(self.timestamp_ns / 1e9)
 
-@dataclass
+
+@dataclass(slots=True)
 class SugarStatistics:
     """糖度检测统计数据"""
     date: date
@@ -61,4 +66,4 @@ class SugarStatistics:
                 self.acid_sum += record.acid_content
                 self.acid_avg = self.acid_sum / self.acid_count if self.acid_count > 0 else 0.0
         else:
-            self.failed_count += 1
\ No newline at end of file
+            self.failed_count += 1
@@ -5,7 +5,10 @@
 
 import logging
 import threading
+import time
 from collections import deque
+from itertools import islice
+from dataclasses import replace
 from datetime import datetime, date
 from typing import Dict, List, Optional
 
@@ -20,14 +23,32 @@ class SugarDetectionService:
         self.data_store = data_store
         self.status = SugarDetectionStatus.INACTIVE
         self.recent_records = deque(maxlen=100)  # 内存中保持最近100条记录
+        # lock只保护内存中的最近记录和统计视图，持有时间很短；
+        # _write_lock串行化数据库写入与当日统计视图的重建，读取统计不必等待写库
+        # 加锁顺序固定为 _write_lock -> lock
         self.lock = threading.Lock()
+        self._write_lock = threading.Lock()
         self.logger = logging.getLogger(__name__)
 
+        # 预先绑定检测热路径上的方法，省去每次检测的属性查找
+        self._persist = data_store.persist_detection
+        self._append_recent = self.recent_records.appendleft
+
+        # 最近一次保存成功的检测时间（unix纳秒，0表示尚未检测），整数赋值在GIL下是原子的，读取无需加锁
+        self._last_detection_ts: int = 0
+
+        # 日统计内存视图：启动时由检测记录重建当天统计，之后随检测增量维护
+        self._stats_cache: Dict[date, SugarStatistics] = {}
+        today = date.today()
+        stats = data_store.rebuild_daily(today)
+        if stats is not None:
+            self._stats_cache[today] = stats
+
     def process_detection(self, sugar_content: float, acid_content: Optional[float] = None,
                          serial_number: Optional[int] = None,
                          exception_code: Optional[int] = None) -> SugarDetectionRecord:
         """处理一次糖度检测"""
-        timestamp = datetime.now()
+        timestamp_ns = time.time_ns()
 
         # 检测成功的条件：糖度值有效且无异常码
         detection_success = (sugar_content is not None and
@@ -36,7 +57,7 @@ class SugarDetectionService:
 
         record = SugarDetectionRecord(
             id=0,  # 将在数据库保存时分配
-            timestamp=timestamp,
+            timestamp_ns=timestamp_ns,
             sugar_content=sugar_content,
             acid_content=acid_content,
             serial_number=serial_number,
@@ -44,22 +65,26 @@ class SugarDetectionService:
             detection_success=detection_success
         )
 
-        # 保存记录
-        if self.data_store.save_detection_record(record):
-            # 更新统计数据
-            self.data_store.update_statistics(record)
+        # 保存记录并更新统计数据；写库与统计视图的重建互斥，避免漏计或重复计入
+        with self._write_lock:
+            if self._persist(record):
+                # 只有保存成功的检测才更新最近检测时间，与最近记录保持一致
+                self._last_detection_ts = timestamp_ns
+                with self.lock:
+                    # 更新内存中的最近记录
+                    self._append_recent(record)
 
-            # 更新内存中的最近记录
-            with self.lock:
-                self.recent_records.appendleft(record)
+                    stats = self._stats_cache.get(date.fromtimestamp(timestamp_ns // 1_000_000_000))
+                    if stats is not None:
+                        stats.add_record(record)
 
         return record
 
     def get_recent_records(self, limit: int = 100) -> List[SugarDetectionRecord]:
         """获取最近的检测记录"""
         # 优先从内存获取，如果不足则从数据库补充
-        with self.lock:
-            memory_records = list(self.recent_records)[:limit]
+        # deque只在头部追加且不会清空，islice在C层一次性复制，无需加锁
+        memory_records = list(islice(self.recent_records, limit))
 
         if len(memory_records) >= limit:
             return memory_records
@@ -73,17 +98,35 @@ class SugarDetectionService:
         if target_date is None:
             target_date = date.today()
 
-        stats = self.data_store.get_daily_statistics(target_date)
-        return stats if stats else SugarStatistics(date=target_date)
+        with self.lock:
+            stats = self._stats_cache.get(target_date)
+            if stats is not None:
+                return replace(stats)
+
+        if target_date != date.today():
+            stats = self.data_store.get_daily_statistics(target_date)
+            return stats if stats else SugarStatistics(date=target_date)
+
+        # 只保留今天的视图（由检测记录重建），跨天后旧日期自然淘汰；重建期间暂停写库
+        with self._write_lock:
+            with self.lock:
+                stats = self._stats_cache.get(target_date)
+            if stats is None:
+                stats = self.data_store.rebuild_daily(target_date)
+                if stats is None:
+                    return SugarStatistics(date=target_date)
+                with self.lock:
+                    self._stats_cache = {target_date: stats}
+            with self.lock:
+                return replace(stats)
 
     def get_status(self) -> Dict:
         """获取服务状态"""
-        with self.lock:
-            recent_count = len(self.recent_records)
-            last_detection = self.recent_records[0].timestamp if recent_count > 0 else None
+        last_detection_ts = self._last_detection_ts
+        last_detection = datetime.fromtimestamp(last_detection_ts / 1e9) if last_detection_ts else None
 
         return {
             "status": self.status.value,
-            "recent_records_count": recent_count,
+            "recent_records_count": len(self.recent_records),
             "last_detection_time": last_detection.isoformat() if last_detection else None
         }
\ No newline at end of file
@@ -3,28 +3,177 @@
 """
 
 import sqlite3
-import threading
 import logging
-from datetime import datetime, date
-from typing import List, Optional
+import queue
+from contextlib import contextmanager
+from dataclasses import replace
+from datetime import datetime, date, time, timedelta
+from pathlib import Path
+from time import monotonic
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from ciso8601 import parse_datetime as _parse_iso  # C实现的ISO8601解析，比fromisoformat快一个数量级
+except ImportError:  # 未安装 ciso8601 时回退到标准库
+    _parse_iso = datetime.fromisoformat
 
 from .interfaces import ISugarDataStore
 from .models import SugarDetectionRecord, SugarStatistics
 
+# 语句缓存容量：热路径SQL均为下方模块级常量，文本完全一致才能命中缓存
+STATEMENT_CACHE_SIZE = 256
+
+INSERT_RECORD_SQL = (
+    "INSERT INTO sugar_detection_records "
+    "(timestamp, sugar_content, acid_content, serial_number, exception_code, detection_success) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+SELECT_LAST_ROWID_SQL = "SELECT last_insert_rowid()"
+SELECT_RECENT_RECORDS_SQL = (
+    "SELECT id, timestamp, sugar_content, acid_content, serial_number, exception_code, detection_success "
+    "FROM sugar_detection_records ORDER BY timestamp DESC LIMIT ?"
+)
+SELECT_DAILY_STATISTICS_SQL = (
+    "SELECT total_count, success_count, failed_count, sugar_sum, sugar_avg, acid_sum, acid_avg, acid_count "
+    "FROM sugar_daily_statistics INDEXED BY idx_sugar_stats_cover WHERE date = ?"
+)
+REBUILD_DAILY_STATISTICS_SQL = (
+    "SELECT COUNT(*), COALESCE(SUM(detection_success), 0), "
+    "COALESCE(SUM(CASE WHEN detection_success THEN sugar_content END), 0.0), "
+    "COALESCE(SUM(CASE WHEN detection_success THEN acid_content END), 0.0), "
+    "COUNT(CASE WHEN detection_success THEN acid_content END) "
+    "FROM sugar_detection_records WHERE timestamp >= ? AND timestamp < ?"
+)
+UPSERT_STATISTICS_SQL = (
+    "INSERT INTO sugar_daily_statistics "
+    "(date, total_count, success_count, failed_count, sugar_sum, sugar_avg, acid_sum, acid_avg, acid_count) "
+    "VALUES (?, 1, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(date) DO UPDATE SET "
+    "total_count = total_count + 1, "
+    "success_count = success_count + excluded.success_count, "
+    "failed_count = failed_count + excluded.failed_count, "
+    "sugar_sum = sugar_sum + excluded.sugar_sum, "
+    "acid_sum = acid_sum + excluded.acid_sum, "
+    "acid_count = acid_count + excluded.acid_count, "
+    "sugar_avg = CASE WHEN success_count + excluded.success_count > 0 "
+    "THEN (sugar_sum + excluded.sugar_sum) / (success_count + excluded.success_count) ELSE 0 END, "
+    "acid_avg = CASE WHEN acid_count + excluded.acid_count > 0 "
+    "THEN (acid_sum + excluded.acid_sum) / (acid_count + excluded.acid_count) ELSE 0 END"
+)
+
+# 日统计查询结果的缓存有效期（秒）：当日数据持续变化，历史日期基本不变
+TODAY_STATISTICS_TTL = 1.0
+PAST_STATISTICS_TTL = 3600.0
+MAX_CACHED_STATISTICS_DAYS = 31
+
+
+def _to_epoch_ns(dt: datetime) -> int:
+    """datetime -> unix纳秒整数（数据库存储格式）"""
+    return int(dt.timestamp()) * 1_000_000_000 + dt.microsecond * 1000
+
+
+def _day_bounds_ns(value: date) -> Tuple[int, int]:
+    """某日本地时间[0点, 次日0点)对应的unix纳秒区间"""
+    start = datetime.combine(value, time.min)
+    return _to_epoch_ns(start), _to_epoch_ns(start + timedelta(days=1))
+
+
+def _iso_to_ns(value: Optional[str]) -> Optional[int]:
+    """迁移用：ISO时间字符串 -> unix纳秒整数"""
+    return _to_epoch_ns(_parse_iso(value)) if value is not None else None
+
+
+def _apply_pragmas(conn: sqlite3.Connection):
+    """设置连接级PRAGMA（WAL模式持久化在数据库文件中，其余每个连接都需重新设置）"""
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=134217728")
+    conn.execute("PRAGMA cache_size=-20000")
+    conn.execute("PRAGMA busy_timeout=5000")
+
 
 class SQLiteSugarDataStore(ISugarDataStore):
     """基于SQLite的糖度数据存储实现"""
 
-    def __init__(self, db_path: str = "sugar_detection.db"):
+    def __init__(self, db_path: str = "sugar_detection.db", read_pool_size: int = 4, write_pool_size: int = 2):
         self.db_path = db_path
-        self.lock = threading.Lock()
-        self._init_database()
         self.logger = logging.getLogger(__name__)
+        # 读写连接池（LIFO，保持最近使用连接的页缓存热度），连接数有上限，不随请求线程增长
+        # 写事务以BEGIN IMMEDIATE开始，由SQLite写锁 + busy_timeout串行化，不需要Python层的锁
+        self._write_pool: queue.LifoQueue = queue.LifoQueue(maxsize=max(1, write_pool_size))
+        self._read_pool: queue.LifoQueue = queue.LifoQueue(maxsize=max(1, read_pool_size))
+        # 日统计缓存：日期 -> (缓存时间, 统计数据)，写入统计时失效
+        self._stats_cache: Dict[date, Tuple[float, SugarStatistics]] = {}
+        self._init_database()
+
+    def _create_write_connection(self) -> sqlite3.Connection:
+        """创建写连接（自动提交模式，事务显式开启）"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        _apply_pragmas(conn)
+        return conn
+
+    def _create_read_connection(self) -> sqlite3.Connection:
+        """创建只读连接"""
+        uri = f"{Path(self.db_path).resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        _apply_pragmas(conn)
+        conn.execute("PRAGMA query_only=1")
+        return conn
+
+    @staticmethod
+    @contextmanager
+    def _borrow(pool: queue.LifoQueue, create):
+        """从连接池借出连接，用完归还；池已满时关闭多余连接"""
+        try:
+            conn = pool.get_nowait()
+        except queue.Empty:
+            conn = create()
+        try:
+            yield conn
+        except BaseException:
+            # 出错的连接状态未知，直接关闭不放回池中
+            conn.close()
+            raise
+        try:
+            pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _acquire_read(self):
+        """借出只读连接"""
+        return self._borrow(self._read_pool, self._create_read_connection)
+
+    @contextmanager
+    def _transaction(self):
+        """借出写连接开启写事务，正常退出提交，异常回滚"""
+        with self._borrow(self._write_pool, self._create_write_connection) as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield cursor
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        """关闭连接池中的全部连接"""
+        for pool in (self._write_pool, self._read_pool):
+            while True:
+                try:
+                    conn = pool.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
 
     def _init_database(self):
         """初始化数据库表结构"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        with self._transaction() as cursor:
+            cursor.connection.create_function('iso_to_ns', 1, _iso_to_ns, deterministic=True)
+            legacy = self._rename_legacy_records(cursor)
 
             # 糖度检测记录表
             cursor.execute('''
@@ -36,7 +185,7 @@ class SQLiteSugarDataStore(ISugarDataStore):
                                KEY
                                AUTOINCREMENT,
                                timestamp
-                               TIMESTAMP
+                               INTEGER
                                NOT
                                NULL,
                                sugar_content
@@ -123,155 +272,202 @@ class SQLiteSugarDataStore(ISugarDataStore):
                            )
                            ''')
 
+            # 旧表导入后删除（其索引随之删除），之后才能以同名创建新表的索引
+            if legacy:
+                self._import_legacy_records(cursor)
+
             # 创建索引
             cursor.execute(
                 'CREATE INDEX IF NOT EXISTS idx_sugar_records_timestamp ON sugar_detection_records(timestamp)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_sugar_statistics_date ON sugar_daily_statistics(date)')
+            # 日统计覆盖索引：按日期读取统计只走索引，不回表
+            cursor.execute('''
+                           CREATE INDEX IF NOT EXISTS idx_sugar_stats_cover
+                               ON sugar_daily_statistics (date, total_count, success_count, failed_count, sugar_sum,
+                                                          sugar_avg, acid_sum, acid_avg, acid_count)
+                           ''')
+            # 被覆盖索引取代的旧索引（date的唯一约束另有自动索引），保留只会增加写入开销
+            cursor.execute('DROP INDEX IF EXISTS idx_sugar_statistics_date')
+
+    @staticmethod
+    def _rename_legacy_records(cursor: sqlite3.Cursor) -> bool:
+        """时间戳仍为ISO字符串的旧检测记录表改名保留，待新表建好后导入"""
+        row = cursor.execute("SELECT type FROM pragma_table_info('sugar_detection_records') "
+                             "WHERE name = 'timestamp'").fetchone()
+        if row and row[0].upper() == 'TIMESTAMP':
+            cursor.execute('ALTER TABLE sugar_detection_records RENAME TO sugar_detection_records_legacy')
+            return True
+        return False
 
-            conn.commit()
+    def _import_legacy_records(self, cursor: sqlite3.Cursor):
+        """将旧表记录的时间戳转换为unix纳秒导入新表，然后删除旧表"""
+        cursor.execute('''
+                       INSERT INTO sugar_detection_records
+                       (id, timestamp, sugar_content, acid_content, serial_number, exception_code, detection_success)
+                       SELECT id, iso_to_ns(timestamp), sugar_content, acid_content, serial_number, exception_code,
+                              detection_success
+                       FROM sugar_detection_records_legacy
+                       ''')
+        cursor.execute('DROP TABLE sugar_detection_records_legacy')
+        self.logger.info("sugar_detection_records 时间戳已迁移为整数格式")
 
     def save_detection_record(self, record: SugarDetectionRecord) -> bool:
         """保存检测记录"""
         try:
-            with self.lock:
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute('''
-                                   INSERT INTO sugar_detection_records
-                                   (timestamp, sugar_content, acid_content, serial_number, exception_code,
-                                    detection_success)
-                                   VALUES (?, ?, ?, ?, ?, ?)
-                                   ''', (
-                                       record.timestamp.isoformat(),
-                                       record.sugar_content,
-                                       record.acid_content,
-                                       record.serial_number,
-                                       record.exception_code,
-                                       record.detection_success
-                                   ))
-
-                    # 获取分配的ID
-                    record.id = cursor.lastrowid
-                    conn.commit()
-                    return True
+            with self._transaction() as cursor:
+                self._insert_record(cursor, record)
+            return True
+        except Exception as e:
+            self.logger.error(f"保存糖度检测记录失败: {e}")
+            return False
+
+    def save_detection_records(self, records: List[SugarDetectionRecord]) -> bool:
+        """在一个事务内批量保存检测记录"""
+        if not records:
+            return True
+        rows = [
+            (record.timestamp_ns, record.sugar_content, record.acid_content, record.serial_number,
+             record.exception_code, record.detection_success)
+            for record in records
+        ]
+        try:
+            with self._transaction() as cursor:
+                cursor.executemany(INSERT_RECORD_SQL, rows)
+                # executemany不更新lastrowid，同一事务内的自增ID连续，由最后一条反推
+                last_id = cursor.execute(SELECT_LAST_ROWID_SQL).fetchone()[0]
+
+            first_id = last_id - len(records) + 1
+            for i, record in enumerate(records):
+                record.id = first_id + i
+            return True
+        except Exception as e:
+            self.logger.error(f"批量保存糖度检测记录失败({len(records)}条): {e}")
+            return False
+
+    def persist_detection(self, record: SugarDetectionRecord) -> bool:
+        """在同一事务内保存检测记录并更新统计数据"""
+        try:
+            with self._transaction() as cursor:
+                self._insert_record(cursor, record)
+                self._accumulate_statistics(cursor, record)
+            self._stats_cache.pop(record.timestamp.date(), None)
+            return True
         except Exception as e:
             self.logger.error(f"保存糖度检测记录失败: {e}")
             return False
 
+    @staticmethod
+    def _insert_record(cursor: sqlite3.Cursor, record: SugarDetectionRecord):
+        """插入一条检测记录并回填ID"""
+        cursor.execute(INSERT_RECORD_SQL, (record.timestamp_ns, record.sugar_content, record.acid_content,
+                                           record.serial_number, record.exception_code, record.detection_success))
+
+        # 获取分配的ID
+        record.id = cursor.lastrowid
+
     def get_recent_records(self, limit: int = 100) -> List[SugarDetectionRecord]:
         """获取最近的检测记录"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                               SELECT id, timestamp, sugar_content, acid_content, serial_number, exception_code, detection_success
-                               FROM sugar_detection_records
-                               ORDER BY timestamp DESC
-                                   LIMIT ?
-                               ''', (limit,))
-
-                records = []
-                for row in cursor.fetchall():
-                    records.append(SugarDetectionRecord(
-                        id=row[0],
-                        timestamp=datetime.fromisoformat(row[1]),
-                        sugar_content=row[2],
-                        acid_content=row[3],
-                        serial_number=row[4],
-                        exception_code=row[5],
-                        detection_success=bool(row[6])
-                    ))
-
-                return records
+            with self._acquire_read() as conn:
+                rows = conn.execute(SELECT_RECENT_RECORDS_SQL, (limit,)).fetchall()
+
+            records = []
+            for row in rows:
+                records.append(SugarDetectionRecord(
+                    id=row[0],
+                    timestamp_ns=row[1],
+                    sugar_content=row[2],
+                    acid_content=row[3],
+                    serial_number=row[4],
+                    exception_code=row[5],
+                    detection_success=bool(row[6])
+                ))
+
+            return records
         except Exception as e:
             self.logger.error(f"获取糖度检测记录失败: {e}")
             return []
 
     def get_daily_statistics(self, target_date: date) -> Optional[SugarStatistics]:
-        """获取指定日期的统计数据"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                               SELECT total_count,
-                                      success_count,
-                                      failed_count,
-                                      sugar_sum,
-                                      sugar_avg,
-                                      acid_sum,
-                                      acid_avg,
-                                      acid_count
-                               FROM sugar_daily_statistics
-                               WHERE date = ?
-                               ''', (target_date.isoformat(),))
-
-                row = cursor.fetchone()
-                if row:
-                    return SugarStatistics(
-                        date=target_date,
-                        total_count=row[0],
-                        success_count=row[1],
-                        failed_count=row[2],
-                        sugar_sum=row[3],
-                        sugar_avg=row[4],
-                        acid_sum=row[5],
-                        acid_avg=row[6],
-                        acid_count=row[7]
-                    )
-                else:
-                    return SugarStatistics(date=target_date)
+        """获取指定日期的统计数据（短时缓存）"""
+        now = monotonic()
+        cached = self._stats_cache.get(target_date)
+        if cached is not None:
+            ttl = TODAY_STATISTICS_TTL if target_date == date.today() else PAST_STATISTICS_TTL
+            if now - cached[0] < ttl:
+                return replace(cached[1])
 
+        try:
+            statistics = self._query_daily_statistics(target_date)
         except Exception as e:
             self.logger.error(f"获取糖度统计数据失败: {e}")
             return SugarStatistics(date=target_date)
 
+        if len(self._stats_cache) >= MAX_CACHED_STATISTICS_DAYS:
+            self._stats_cache.clear()
+        self._stats_cache[target_date] = (now, statistics)
+        return replace(statistics)
+
+    def _query_daily_statistics(self, target_date: date) -> SugarStatistics:
+        """从统计表读取指定日期的统计数据"""
+        with self._acquire_read() as conn:
+            row = conn.execute(SELECT_DAILY_STATISTICS_SQL, (target_date.isoformat(),)).fetchone()
+
+        if row:
+            return SugarStatistics(
+                date=target_date,
+                total_count=row[0],
+                success_count=row[1],
+                failed_count=row[2],
+                sugar_sum=row[3],
+                sugar_avg=row[4],
+                acid_sum=row[5],
+                acid_avg=row[6],
+                acid_count=row[7]
+            )
+        else:
+            return SugarStatistics(date=target_date)
+
+    def rebuild_daily(self, target_date: date) -> Optional[SugarStatistics]:
+        """由检测记录在SQL内聚合指定日期的统计数据（走时间戳索引的区间扫描），失败返回None"""
+        day_start, day_end = _day_bounds_ns(target_date)
+        try:
+            with self._acquire_read() as conn:
+                row = conn.execute(REBUILD_DAILY_STATISTICS_SQL, (day_start, day_end)).fetchone()
+
+            total_count, success_count, sugar_sum, acid_sum, acid_count = row
+            return SugarStatistics(
+                date=target_date,
+                total_count=total_count,
+                success_count=success_count,
+                failed_count=total_count - success_count,
+                sugar_sum=sugar_sum,
+                sugar_avg=sugar_sum / success_count if success_count > 0 else 0.0,
+                acid_sum=acid_sum,
+                acid_avg=acid_sum / acid_count if acid_count > 0 else 0.0,
+                acid_count=acid_count
+            )
+        except Exception as e:
+            self.logger.error(f"重建糖度统计数据失败: {e}")
+            return None
+
     def update_statistics(self, record: SugarDetectionRecord):
         """更新统计数据"""
         try:
-            with self.lock:
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.cursor()
-                    record_date = record.timestamp.date().isoformat()
-
-                    # 使用INSERT OR REPLACE更新统计
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO sugar_daily_statistics 
-                        (date, total_count, success_count, failed_count, 
-                         sugar_sum, sugar_avg, acid_sum, acid_avg, acid_count)
-                        SELECT ?, 
-                            COALESCE(total_count, 0) + 1,
-                            COALESCE(success_count, 0) + ?,
-                            COALESCE(failed_count, 0) + ?,
-                            COALESCE(sugar_sum, 0) + ?,
-                            0,
-                            COALESCE(acid_sum, 0) + ?,
-                            0,
-                            COALESCE(acid_count, 0) + ?
-                        FROM (
-                            SELECT * FROM sugar_daily_statistics WHERE date = ?
-                            UNION SELECT ?, 0, 0, 0, 0, 0, 0, 0, 0
-                            LIMIT 1
-                        )
-                    ''', (
-                        record_date,
-                        1 if record.detection_success else 0,
-                        0 if record.detection_success else 1,
-                        record.sugar_content if record.detection_success else 0,
-                        record.acid_content if (record.detection_success and record.acid_content) else 0,
-                        1 if (record.detection_success and record.acid_content) else 0,
-                        record_date,
-                        record_date
-                    ))
-
-                    # 重新计算平均值
-                    cursor.execute('''
-                                   UPDATE sugar_daily_statistics
-                                   SET sugar_avg = CASE WHEN success_count > 0 THEN sugar_sum / success_count ELSE 0 END,
-                                       acid_avg  = CASE WHEN acid_count > 0 THEN acid_sum / acid_count ELSE 0 END
-                                   WHERE date = ?
-                                   ''', (record_date,))
-
-                    conn.commit()
+            with self._transaction() as cursor:
+                self._accumulate_statistics(cursor, record)
+            self._stats_cache.pop(record.timestamp.date(), None)
 
         except Exception as e:
-            self.logger.error(f"更新糖度统计数据失败: {e}")
\ No newline at end of file
+            self.logger.error(f"更新糖度统计数据失败: {e}")
+
+    @staticmethod
+    def _accumulate_statistics(cursor: sqlite3.Cursor, record: SugarDetectionRecord):
+        """将一条检测记录累计到当日统计（单条UPSERT，同时重算平均值）"""
+        # 以0/1相乘代替条件分支清零未计入的字段
+        success = int(record.detection_success)
+        acid_counted = success * (record.acid_content is not None)
+        sugar = record.sugar_content * success
+        acid = (record.acid_content or 0.0) * acid_counted
+
+        cursor.execute(UPSERT_STATISTICS_SQL, (record.timestamp.date().isoformat(), success, 1 - success,
+                                               sugar, sugar, acid, acid, acid_counted))
@@ -3,17 +3,34 @@
 将数据存储从实时检测中分离出来
 """
 
+import array
+import bisect
 import threading
-import queue
 import time
 import logging
 from collections import deque
+from dataclasses import dataclass
+from operator import attrgetter
 from datetime import datetime, date
 from typing import Dict, List, Optional, Tuple
 
 from .models import WeightConfigSet, WeightGradeConfig, WeightDetectionRecord, DetectionStatus
 from ..storage.interfaces import IWeightDataStore
 
+# 最近记录缓存中的元组字段，顺序与WeightDetectionRecord的构造参数一致
+_record_fields = attrgetter('id', 'timestamp_ns', 'weight', 'determined_grade', 'kick_channel', 'detection_success')
+
+
+# 后台保存配置失败时的最多尝试次数
+CONFIG_SAVE_ATTEMPTS = 3
+
+
+@dataclass(slots=True)
+class _ConfigSaveMsg:
+    """存储线程的配置保存请求，与检测记录经同一队列传递"""
+    config_set: WeightConfigSet
+    attempts: int = 0  # 已失败的次数
+
 
 class AsyncWeightDetectionService:
     """
@@ -26,25 +43,37 @@ class AsyncWeightDetectionService:
         self.current_config: Optional[WeightConfigSet] = None
         self.status = DetectionStatus.INACTIVE
 
-        # 实时数据缓存 - 无锁访问
+        # 实时数据缓存 - 无锁访问，新记录追加在右端
+        # 元素为交给存储层时的记录字段元组（_record_fields），不持有存储层会回填ID的记录对象；
+        # 此时记录尚未提交、ID为0，带ID的最近记录由存储层提供
         self.recent_records = deque(maxlen=100)
-        self.config_lock = threading.RLock()  # 配置读写锁
-
-        # 异步处理队列
-        self.record_queue = queue.Queue(maxsize=buffer_size)
-        self.statistics_queue = queue.Queue(maxsize=buffer_size)
-
-        # 异步处理线程
+        self.config_lock = threading.RLock()  # 配置写锁；读取方直接读引用（属性重新绑定是原子的）
+        # 分级查找表：(阈值数组, 分级ID, 踢出通道)，仅含启用的分级，随配置整体替换
+        self._grade_table: Tuple[array.array, Tuple[int, ...], Tuple[int, ...]] = (array.array('d'), (), ())
+        # 已写入数据库的配置版本：后台保存完成前或保存失败时小于当前版本，重启后恢复的是这个版本
+        self._persisted_version: Optional[int] = None
+        # 配置快照：(配置, 启用分级数, 更新时间ISO字符串)，与current_config一起替换
+        self._config_snapshot: Tuple[Optional[WeightConfigSet], int, Optional[str]] = (None, 0, None)
+        # 最近一次检测时间的ISO字符串缓存：(记录, 字符串)，最新记录未变时get_status不再格式化
+        self._last_detection_iso: Tuple[object, Optional[str]] = (None, None)
+
+        # 异步处理队列：deque的append/popleft在CPython中是原子操作，生产者无需加锁
+        # 积压达到批量大小时通过Event唤醒工作线程，否则工作线程按超时轮询
+        self.buffer_size = buffer_size
+        self.batch_size = 10  # 批量处理提高效率
+        self.record_queue: deque = deque()
+        self.record_event = threading.Event()
+
+        # 异步处理线程：记录与其日统计由存储线程在同一事务内写入
         self.storage_thread = None
-        self.statistics_thread = None
         self.running = False
 
-        # 性能监控
+        # 性能监控（耗时以整数纳秒记录，报告时换算为秒）
         self.performance_stats = {
             'detection_count': 0,
-            'avg_detection_time': 0.0,
+            'avg_detection_time_ns': 0,
             'queue_overflow_count': 0,
-            'last_detection_time': 0.0
+            'last_detection_time_ns': 0
         }
 
         self.logger = logging.getLogger(__name__)
@@ -68,47 +97,46 @@ class AsyncWeightDetectionService:
         )
         self.storage_thread.start()
 
-        # 统计更新线程
-        self.statistics_thread = threading.Thread(
-            target=self._statistics_worker,
-            name="WeightStatistics",
-            daemon=True
-        )
-        self.statistics_thread.start()
-
         self.logger.info("异步处理线程已启动")
 
     def stop_background_threads(self):
         """停止后台处理线程"""
         self.running = False
+        self.record_event.set()
 
         # 等待队列处理完成
         if self.storage_thread:
             self.storage_thread.join(timeout=5.0)
-        if self.statistics_thread:
-            self.statistics_thread.join(timeout=5.0)
+
+        # 存储层缓冲中的剩余记录由其写入线程按间隔提交，缓冲日志保证进程退出后可重放
 
         self.logger.info("异步处理线程已停止")
 
     def _storage_worker(self):
         """数据存储工作线程"""
         batch_records = []
-        batch_size = 10  # 批量处理提高效率
         last_flush_time = time.time()
 
         while self.running:
             try:
-                # 从队列获取记录，非阻塞模式
-                try:
-                    record = self.record_queue.get(timeout=0.1)
-                    batch_records.append(record)
-                except queue.Empty:
-                    pass
+                # 等待唤醒或超时，批量取出队列中的记录
+                self.record_event.wait(0.1)
+                self.record_event.clear()
+                self._drain(self.record_queue, batch_records)
+
+                config_msg = self._take_config_save(batch_records)
+                if config_msg is not None:
+                    # 先保存已取出的记录，再保存配置
+                    if batch_records:
+                        self._save_batch_records(batch_records)
+                        batch_records.clear()
+                        last_flush_time = time.time()
+                    self._save_config(config_msg)
 
                 # 批量保存条件：达到批量大小或超时
                 current_time = time.time()
                 should_flush = (
-                        len(batch_records) >= batch_size or
+                        len(batch_records) >= self.batch_size or
                         (batch_records and current_time - last_flush_time > 1.0)
                 )
 
@@ -121,31 +149,58 @@ class AsyncWeightDetectionService:
                 self.logger.error(f"存储线程异常: {e}")
                 time.sleep(0.1)
 
-        # 线程退出时保存剩余记录
+        # 线程退出时保存剩余记录和配置
+        self._drain(self.record_queue, batch_records)
+        config_msg = self._take_config_save(batch_records)
         if batch_records:
             self._save_batch_records(batch_records)
+        if config_msg is not None:
+            self._save_config(config_msg)
+
+    @staticmethod
+    def _drain(source: deque, batch: list):
+        """按当前长度一次性取出队列中的记录追加到批次（单消费者，取出期间新入队的留到下一轮）"""
+        popleft = source.popleft
+        batch.extend([popleft() for _ in range(len(source))])
+
+    @staticmethod
+    def _take_config_save(batch: list) -> Optional[_ConfigSaveMsg]:
+        """从批次中移除配置保存请求，返回其中最新的一个（没有则返回None）"""
+        messages = [item for item in batch if type(item) is _ConfigSaveMsg]
+        if not messages:
+            return None
+        batch[:] = [item for item in batch if type(item) is not _ConfigSaveMsg]
+        return messages[-1]
+
+    def _save_config(self, message: _ConfigSaveMsg):
+        """在存储线程中保存配置，失败时重新入队重试，仍失败则记录错误（已保存版本见get_status）"""
+        config_set = message.config_set
+        if self.data_store.save_config(config_set):
+            self._persisted_version = config_set.version
+            self.logger.info(f"配置已保存，版本: {config_set.version}")
+            return
 
-    def _statistics_worker(self):
-        """统计更新工作线程"""
-        while self.running:
-            try:
-                try:
-                    record = self.statistics_queue.get(timeout=0.1)
-                    self.data_store.update_statistics(record)
-                except queue.Empty:
-                    pass
-            except Exception as e:
-                self.logger.error(f"统计线程异常: {e}")
-                time.sleep(0.1)
+        if self.current_config is not config_set:
+            # 已被更新的配置取代，由新配置的保存请求写入
+            self.logger.error(f"配置保存失败，版本: {config_set.version}（已被新配置取代）")
+        elif message.attempts + 1 < CONFIG_SAVE_ATTEMPTS:
+            self.logger.warning(f"配置保存失败，版本: {config_set.version}，稍后重试")
+            self.record_queue.append(_ConfigSaveMsg(config_set, message.attempts + 1))
+            self.record_event.set()
+        else:
+            self.logger.error(
+                f"配置保存失败，版本: {config_set.version}，已生效但未写入数据库，"
+                f"重启后将恢复已保存的版本: {self._persisted_version}"
+            )
 
     def _save_batch_records(self, records: List[WeightDetectionRecord]):
-        """批量保存记录"""
-        for record in records:
-            if self.data_store.save_detection_record(record):
-                # 更新内存缓存
-                self.recent_records.appendleft(record)
-            else:
-                self.logger.error(f"保存记录失败: {record.id}")
+        """批量保存记录（队列中均为检测成功的记录，日统计随记录在同一事务内累计）"""
+        # 由存储层按批量大小/间隔提交
+        if self.data_store.save_detection_records(records, with_statistics=True):
+            # 更新内存缓存
+            self.recent_records.extend(map(_record_fields, records))
+        else:
+            self.logger.error(f"批量保存记录失败: {len(records)}条")
 
     def reload_config(self) -> bool:
         """重新加载配置 - 线程安全"""
@@ -158,7 +213,8 @@ class AsyncWeightDetectionService:
                     return False
 
                 with self.config_lock:
-                    self.current_config = config
+                    self._install_config(config)
+                self._persisted_version = config.version
 
                 self.logger.info("配置加载成功")
                 return True
@@ -193,80 +249,69 @@ class AsyncWeightDetectionService:
             if self.current_config:
                 config_set.version = self.current_config.version + 1
 
-        # 保存到数据库（异步）
-        if self.data_store.save_config(config_set):
+        if self.running:
+            # 后台线程运行中：配置立即生效，交给存储线程异步保存，调用方不等待磁盘写入；
+            # 先安装再入队，存储线程据此判断保存失败的配置是否仍是当前配置
+            with self.config_lock:
+                self._install_config(config_set)
+            self.record_queue.append(_ConfigSaveMsg(config_set))
+            self.record_event.set()
+        elif self.data_store.save_config(config_set):
+            self._persisted_version = config_set.version
             with self.config_lock:
-                self.current_config = config_set
-            self.logger.info(f"配置更新成功，版本: {config_set.version}")
-            return True, "配置更新成功"
+                self._install_config(config_set)
         else:
             return False, "配置保存失败"
 
+        self.logger.info(f"配置更新成功，版本: {config_set.version}")
+        return True, "配置更新成功"
+
+    def _install_config(self, config_set: WeightConfigSet):
+        """安装新配置并重建分级查找表（调用方持有config_lock）"""
+        enabled_configs = [c for c in config_set.configs if c.enabled]
+        self._grade_table = (
+            array.array('d', [c.weight_threshold for c in enabled_configs]),
+            tuple(c.grade_id for c in enabled_configs),
+            tuple(c.kick_channel for c in enabled_configs),
+        )
+        self._config_snapshot = (config_set, len(enabled_configs), config_set.updated_at.isoformat())
+        self.current_config = config_set
+
     def get_current_config(self) -> Optional[WeightConfigSet]:
         """获取当前配置 - 线程安全"""
-        with self.config_lock:
-            return self.current_config
+        return self.current_config
 
     def determine_grade_fast(self, weight: float) -> Tuple[Optional[int], Optional[int]]:
         """
         快速确定分级和踢出通道 - 优化版本
-        无锁访问，专为实时检测优化
+        在预先构建的阈值数组上二分查找，专为实时检测优化
         """
-        # 获取配置快照，避免长时间持有锁
-        with self.config_lock:
-            config = self.current_config
-
-        if not config:
-            return None, None
+        # 查找表整体替换，读取一次引用即得到一致的快照，无需加锁
+        thresholds, grades, channels = self._grade_table
 
-        enabled_configs = [c for c in config.configs if c.enabled]
-        if not enabled_configs:
+        if not grades:
             return None, None
 
-        # 二分查找优化（如果配置较多）
-        if len(enabled_configs) > 5:
-            return self._binary_search_grade(weight, enabled_configs)
-        else:
-            # 线性查找（配置较少时更快）
-            for config_item in enabled_configs:
-                if weight <= config_item.weight_threshold:
-                    return config_item.grade_id, config_item.kick_channel
-
-            # 超过所有阈值，使用最后一个分级
-            last_config = enabled_configs[-1]
-            return last_config.grade_id, last_config.kick_channel
-
-    def _binary_search_grade(self, weight: float, configs: List[WeightGradeConfig]) -> Tuple[int, int]:
-        """二分查找分级（优化大量配置的情况）"""
-        left, right = 0, len(configs) - 1
-
-        while left <= right:
-            mid = (left + right) // 2
-            if weight <= configs[mid].weight_threshold:
-                if mid == 0 or weight > configs[mid - 1].weight_threshold:
-                    return configs[mid].grade_id, configs[mid].kick_channel
-                right = mid - 1
-            else:
-                left = mid + 1
-
-        # 超过所有阈值
-        last_config = configs[-1]
-        return last_config.grade_id, last_config.kick_channel
+        # 第一个阈值 >= weight 的分级；超过所有阈值时使用最后一个分级
+        i = bisect.bisect_left(thresholds, weight)
+        if i == len(grades):
+            i -= 1
+        return grades[i], channels[i]
 
     def process_detection_fast(self, weight: float) -> WeightDetectionRecord:
         """
         快速处理检测 - 实时优化版本
         只进行必要的计算，存储操作异步处理
         """
-        start_time = time.perf_counter()
+        start_ns = time.perf_counter_ns()
 
-        timestamp = datetime.now()
+        timestamp_ns = time.time_ns()
         grade, kick_channel = self.determine_grade_fast(weight)
 
         if grade is None or grade == 1:
             record = WeightDetectionRecord(
                 id=0,
-                timestamp=timestamp,
+                timestamp_ns=timestamp_ns,
                 weight=weight,
                 determined_grade=0,
                 kick_channel=0,
@@ -275,7 +320,7 @@ class AsyncWeightDetectionService:
         else:
             record = WeightDetectionRecord(
                 id=0,
-                timestamp=timestamp,
+                timestamp_ns=timestamp_ns,
                 weight=weight,
                 determined_grade=grade,
                 kick_channel=kick_channel,
@@ -284,46 +329,37 @@ class AsyncWeightDetectionService:
 
         # 异步保存记录
         if record.detection_success:
-            try:
-                self.record_queue.put_nowait(record)
-                self.statistics_queue.put_nowait(record)
-            except queue.Full:
+            record_queue = self.record_queue
+            if len(record_queue) >= self.buffer_size:
                 self.performance_stats['queue_overflow_count'] += 1
                 self.logger.warning("队列已满，丢弃记录")
+            else:
+                record_queue.append(record)
+                # 只在积压达到批量大小时唤醒（is_set不加锁，避免重复set）
+                if len(record_queue) >= self.batch_size and not self.record_event.is_set():
+                    self.record_event.set()
 
         # 更新性能统计
-        detection_time = time.perf_counter() - start_time
-        self._update_performance_stats(detection_time)
+        self._update_performance_stats(time.perf_counter_ns() - start_ns)
 
         return record
 
-    def _update_performance_stats(self, detection_time: float):
+    def _update_performance_stats(self, detection_time_ns: int):
         """更新性能统计"""
         stats = self.performance_stats
         stats['detection_count'] += 1
-        stats['last_detection_time'] = detection_time
+        stats['last_detection_time_ns'] = detection_time_ns
 
-        # 计算移动平均
-        alpha = 0.1  # 平滑因子
-        if stats['avg_detection_time'] == 0:
-            stats['avg_detection_time'] = detection_time
+        # 计算移动平均（平滑因子0.1，整数运算）
+        if stats['avg_detection_time_ns'] == 0:
+            stats['avg_detection_time_ns'] = detection_time_ns
         else:
-            stats['avg_detection_time'] = (
-                    alpha * detection_time +
-                    (1 - alpha) * stats['avg_detection_time']
-            )
+            stats['avg_detection_time_ns'] = (stats['avg_detection_time_ns'] * 9 + detection_time_ns) // 10
 
     def get_recent_records(self, limit: int = 100) -> List[WeightDetectionRecord]:
         """获取最近的检测记录"""
-        # 优先从内存缓存获取
-        memory_records = list(self.recent_records)[:limit]
-
-        if len(memory_records) >= limit:
-            return memory_records
-        else:
-            # 从数据库补充
-            db_records = self.data_store.get_recent_records(limit)
-            return db_records
+        # ID在存储层提交时才分配，由存储层合并已提交记录与其写缓冲返回（读取不触发写入）
+        return self.data_store.get_recent_records(limit)
 
     def get_daily_statistics(self, target_date: Optional[date] = None):
         """获取指定日期的统计数据"""
@@ -336,8 +372,9 @@ class AsyncWeightDetectionService:
         """获取性能统计"""
         stats = self.performance_stats.copy()
         stats.update({
-            'record_queue_size': self.record_queue.qsize(),
-            'statistics_queue_size': self.statistics_queue.qsize(),
+            'avg_detection_time': stats.pop('avg_detection_time_ns') / 1e9,
+            'last_detection_time': stats.pop('last_detection_time_ns') / 1e9,
+            'record_queue_size': len(self.record_queue),
             'recent_records_count': len(self.recent_records),
             'background_threads_running': self.running
         })
@@ -346,23 +383,29 @@ class AsyncWeightDetectionService:
     def get_status(self) -> Dict:
         """获取服务状态"""
         recent_count = len(self.recent_records)
-        last_detection = self.recent_records[0].timestamp if recent_count > 0 else None
+        last_detection = None
+        if recent_count > 0:
+            last_record = self.recent_records[-1]
+            cached_record, last_detection = self._last_detection_iso
+            if cached_record is not last_record:
+                last_detection = datetime.fromtimestamp(last_record[1] / 1e9).isoformat()
+                self._last_detection_iso = (last_record, last_detection)
 
         config_info = None
-        with self.config_lock:
-            if self.current_config:
-                enabled_count = sum(1 for config in self.current_config.configs if config.enabled)
-                config_info = {
-                    "total_grades": len(self.current_config.configs),
-                    "enabled_grades": enabled_count,
-                    "version": self.current_config.version,
-                    "updated_at": self.current_config.updated_at.isoformat()
-                }
+        current_config, enabled_count, updated_at = self._config_snapshot
+        if current_config:
+            config_info = {
+                "total_grades": len(current_config.configs),
+                "enabled_grades": enabled_count,
+                "version": current_config.version,
+                "persisted_version": self._persisted_version,
+                "updated_at": updated_at
+            }
 
         return {
             "status": self.status.value,
             "recent_records_count": recent_count,
-            "last_detection_time": last_detection.isoformat() if last_detection else None,
+            "last_detection_time": last_detection,
             "config_info": config_info,
             "performance": self.get_performance_stats()
         }
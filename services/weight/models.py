@@ -16,7 +16,7 @@ class DetectionStatus(Enum):
     CALIBRATING = "calibrating"
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class WeightGradeConfig:
     """重量分级配置"""
     grade_id: int  # 分级ID (1-10)
@@ -32,7 +32,7 @@ class WeightGradeConfig:
             raise ValueError("weight_threshold must be non-negative")
 
 
-@dataclass
+@dataclass(slots=True)
 class WeightConfigSet:
     """完整的重量配置集合"""
     configs: List[WeightGradeConfig] = field(default_factory=list)
@@ -65,18 +65,28 @@ class WeightConfigSet:
         return True, "配置验证通过"
 
 
-@dataclass
+@dataclass(slots=True)
 class WeightDetectionRecord:
     """重量检测记录"""
     id: int
-    timestamp: datetime
+    timestamp_ns: int  # 检测时间（unix纳秒），读取timestamp时才转换为datetime
     weight: float  # 检测到的重量
     determined_grade: int  # 判定的分级
     kick_channel: int  # 踢出通道
     detection_success: bool = True  # 检测是否成功
 
+    @property
+    def timestamp(self) -> datetime:
+        """检测时间"""
+        return datetime.fromtimestamp(self.timestamp_ns / 1e9)
 
-@dataclass
+    @property
+    def detection_date(self) -> date:
+        """检测日期（本地时间）"""
+        return date.fromtimestamp(self.timestamp_ns // 1_000_000_000)
+
+
+@dataclass(slots=True)
 class WeightStatistics:
     """重量检测统计数据"""
     date: date
@@ -89,4 +99,10 @@ class WeightStatistics:
         """添加一条记录到统计中"""
         self.total_count += 1
         self.weight_sum += weight
+        self.weight_avg = self.weight_sum / self.total_count
+
+    def add_records(self, count: int, weight_sum: float):
+        """将一组已合并的记录（条数, 重量总和）添加到统计中"""
+        self.total_count += count
+        self.weight_sum += weight_sum
         self.weight_avg = self.weight_sum / self.total_count
\ No newline at end of file
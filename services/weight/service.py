@@ -2,10 +2,14 @@
 重量检测服务主类
 """
 
+import array
+import bisect
 import logging
 import threading
+import time
 from collections import deque
 from datetime import datetime, date
+from itertools import islice
 from typing import Dict, List, Optional, Tuple
 
 from .models import WeightConfigSet, WeightGradeConfig, WeightDetectionRecord, DetectionStatus
@@ -19,8 +23,18 @@ class WeightDetectionService:
         self.data_store = data_store
         self.current_config: Optional[WeightConfigSet] = None
         self.status = DetectionStatus.INACTIVE
-        self.recent_records = deque(maxlen=100)  # 内存中保持最近100条记录
+        self.recent_limit = 100  # 内存中保持最近100条记录
+        # 最近记录（新记录在右端），持有self.lock追加；
+        # 读取用的元组快照（新记录在前）在读取时生成并缓存，有新记录时置为None
+        self._recent_records: deque = deque(maxlen=self.recent_limit)
+        self._recent_snapshot: Optional[Tuple[WeightDetectionRecord, ...]] = ()
+        # 配置快照：(配置, 启用分级数, 更新时间ISO字符串)，与current_config一起替换
+        self._config_snapshot: Tuple[Optional[WeightConfigSet], int, Optional[str]] = (None, 0, None)
+        # 最近一次检测时间的ISO字符串缓存：(记录, 字符串)，最新记录未变时get_status不再格式化
+        self._last_detection_iso: Tuple[object, Optional[str]] = (None, None)
         self.lock = threading.Lock()
+        # 分级查找表：(阈值数组, 分级ID, 踢出通道)，配置变化时整体替换
+        self._grade_table: Tuple[array.array, Tuple[int, ...], Tuple[int, ...]] = (array.array('d'), (), ())
         self.logger = logging.getLogger(__name__)
 
         # 加载配置
@@ -35,6 +49,8 @@ class WeightDetectionService:
                 if not is_valid:
                     self.logger.error(f"配置验证失败: {message}")
                     return False
+                with self.lock:
+                    self._install_config(self.current_config)
                 self.logger.info("配置加载成功")
                 return True
             else:
@@ -70,44 +86,51 @@ class WeightDetectionService:
         # 保存到数据库
         if self.data_store.save_config(config_set):
             with self.lock:
-                self.current_config = config_set
+                self._install_config(config_set)
             self.logger.info(f"配置更新成功，版本: {config_set.version}")
             return True, "配置更新成功"
         else:
             return False, "配置保存失败"
 
+    def _install_config(self, config_set: WeightConfigSet):
+        """安装新配置并重建分级查找表（调用方持有lock）"""
+        enabled_configs = [c for c in config_set.configs if c.enabled]
+        self._grade_table = (
+            array.array('d', [c.weight_threshold for c in enabled_configs]),
+            tuple(c.grade_id for c in enabled_configs),
+            tuple(c.kick_channel for c in enabled_configs),
+        )
+        self._config_snapshot = (config_set, len(enabled_configs), config_set.updated_at.isoformat())
+        self.current_config = config_set
+
     def get_current_config(self) -> Optional[WeightConfigSet]:
         """获取当前配置"""
         return self.current_config
 
     def determine_grade(self, weight: float) -> Tuple[Optional[int], Optional[int]]:
         """根据重量确定分级和踢出通道"""
-        if not self.current_config:
-            return None, None
+        # 查找表整体替换，读取一次引用即得到一致的快照，无需加锁
+        thresholds, grades, channels = self._grade_table
 
-        enabled_configs = [config for config in self.current_config.configs if config.enabled]
-        if not enabled_configs:
+        if not grades:
             return None, None
 
-        # 按重量阈值查找合适的分级
-        for config in enabled_configs:
-            if weight <= config.weight_threshold:
-                return config.grade_id, config.kick_channel
-
-        # 如果超过所有阈值，使用最后一个分级
-        last_config = enabled_configs[-1]
-        return last_config.grade_id, last_config.kick_channel
+        # 第一个阈值 >= weight 的分级；超过所有阈值时使用最后一个分级
+        i = bisect.bisect_left(thresholds, weight)
+        if i == len(grades):
+            i -= 1
+        return grades[i], channels[i]
 
     def process_detection(self, weight: float) -> WeightDetectionRecord:
         """处理一次重量检测"""
-        timestamp = datetime.now()
+        timestamp_ns = time.time_ns()
         grade, kick_channel = self.determine_grade(weight)
 
         if grade is None:
             # 检测失败的情况
             record = WeightDetectionRecord(
                 id=0,  # 将在数据库保存时分配
-                timestamp=timestamp,
+                timestamp_ns=timestamp_ns,
                 weight=weight,
                 determined_grade=0,
                 kick_channel=0,
@@ -116,38 +139,43 @@ class WeightDetectionService:
         else:
             record = WeightDetectionRecord(
                 id=0,
-                timestamp=timestamp,
+                timestamp_ns=timestamp_ns,
                 weight=weight,
                 determined_grade=grade,
                 kick_channel=kick_channel,
                 detection_success=True
             )
 
-        # 保存记录
-        if self.data_store.save_detection_record(record):
-            # 更新统计数据
-            if record.detection_success:
-                self.data_store.update_statistics(record)
+        # 先放入最近记录，读取不必等待批量写入；只追加一条并标记快照失效，不复制已有记录
+        with self.lock:
+            self._recent_records.append(record)
+            self._recent_snapshot = None
 
-            # 更新内存中的最近记录
-            with self.lock:
-                self.recent_records.appendleft(record)
+        # 记录进入存储层写缓冲，由写入线程按批次executemany落盘并合并统计增量（成功检测才计入统计）
+        self.data_store.persist_detection(record)
 
         return record
 
     def get_recent_records(self, limit: int = 100) -> List[WeightDetectionRecord]:
         """获取最近的检测记录"""
-        # 优先从内存获取，如果不足则从数据库补充
-        with self.lock:
-            memory_records = list(self.recent_records)[:limit]
+        # 优先从内存获取，如果不足则从数据库补充；只复制需要的前limit条
+        snapshot = self._get_recent_snapshot()
 
-        if len(memory_records) >= limit:
-            return memory_records
+        if len(snapshot) >= limit:
+            return list(islice(snapshot, limit))
         else:
             # 从数据库获取更多记录
             db_records = self.data_store.get_recent_records(limit)
             return db_records
 
+    def _get_recent_snapshot(self) -> Tuple[WeightDetectionRecord, ...]:
+        """最近记录的元组快照（新记录在前），自上次读取后没有新记录时直接复用"""
+        with self.lock:
+            snapshot = self._recent_snapshot
+            if snapshot is None:
+                snapshot = self._recent_snapshot = tuple(reversed(self._recent_records))
+        return snapshot
+
     def get_daily_statistics(self, target_date: Optional[date] = None):
         """获取指定日期的统计数据"""
         if target_date is None:
@@ -158,22 +186,28 @@ class WeightDetectionService:
     def get_status(self) -> Dict:
         """获取服务状态"""
         with self.lock:
-            recent_count = len(self.recent_records)
-            last_detection = self.recent_records[0].timestamp if recent_count > 0 else None
-
+            recent_count = len(self._recent_records)
+            last_record = self._recent_records[-1] if recent_count else None
+        last_detection = None
+        if last_record is not None:
+            cached_record, last_detection = self._last_detection_iso
+            if cached_record is not last_record:
+                last_detection = last_record.timestamp.isoformat()
+                self._last_detection_iso = (last_record, last_detection)
+
+        config, enabled_count, updated_at = self._config_snapshot
         config_info = None
-        if self.current_config:
-            enabled_count = sum(1 for config in self.current_config.configs if config.enabled)
+        if config:
             config_info = {
-                "total_grades": len(self.current_config.configs),
+                "total_grades": len(config.configs),
                 "enabled_grades": enabled_count,
-                "version": self.current_config.version,
-                "updated_at": self.current_config.updated_at.isoformat()
+                "version": config.version,
+                "updated_at": updated_at
             }
 
         return {
             "status": self.status.value,
             "recent_records_count": recent_count,
-            "last_detection_time": last_detection.isoformat() if last_detection else None,
+            "last_detection_time": last_detection,
             "config_info": config_info
         }
\ No newline at end of file
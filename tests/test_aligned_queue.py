@@ -0,0 +1,65 @@
+"""
+对齐队列：环形缓冲淘汰最旧位置、同一位置重复写入、对齐取数丢弃过期位置
+"""
+
+import unittest
+
+from utils.aligned_queue import AlignedQueue
+
+
+class AlignedQueueTest(unittest.TestCase):
+
+    def test_invalid_length(self):
+        for max_length in (0, -1, 2.5):
+            with self.assertRaises(ValueError):
+                AlignedQueue(max_length)
+
+    def test_full_queue_evicts_oldest_position(self):
+        queue = AlignedQueue(3)
+        for position in range(1, 5):
+            queue.put(position * 10, position)
+
+        self.assertEqual(queue.size(), 3)
+        self.assertIsNone(queue.get_aligned(1))
+        self.assertEqual(queue.get_aligned(2), (20, 2))
+        self.assertEqual(queue.get_aligned(4), (40, 4))
+        self.assertTrue(queue.is_empty())
+
+    def test_duplicate_position_keeps_latest_without_taking_a_slot(self):
+        queue = AlignedQueue(3)
+        queue.put('a', 1)
+        queue.put('b', 1)
+        queue.put('c', 2)
+        queue.put('d', 3)
+
+        # 重复写入不占用环形缓冲的位置，位置1未被淘汰
+        self.assertEqual(queue.size(), 3)
+        self.assertEqual(queue.get_aligned(1), ('b', 1))
+
+    def test_get_aligned_discards_older_positions(self):
+        queue = AlignedQueue(5)
+        for position in (1, 2, 3, 5):
+            queue.put(position, position)
+
+        self.assertEqual(queue.get_aligned(2), (2, 2))
+        self.assertIsNone(queue.get_aligned(1))
+        self.assertEqual(queue.size(), 2)
+
+        # 对齐位置没有数据时返回None，之前的位置仍然丢弃
+        self.assertIsNone(queue.get_aligned(4))
+        self.assertEqual(queue.size(), 1)
+        self.assertEqual(queue.get_aligned(5), (5, 5))
+
+    def test_ring_wraps_around(self):
+        queue = AlignedQueue(2)
+        for position in range(1, 20):
+            queue.put(position, position)
+            if position % 3 == 0:
+                self.assertEqual(queue.get_aligned(position - 1), (position - 1, position - 1))
+        self.assertEqual(queue.size(), 2)
+        self.assertEqual(queue.get_aligned(19), (19, 19))
+        self.assertTrue(queue.is_empty())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+配置重新加载：后台重新加载与手动重新加载互斥、持有ConfigManager.lock（配置接口修改XML）时重新加载等待
+"""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from utils.DataManager import DataManager
+
+CONFIG_XML = """<?xml version="1.0" encoding="utf-8" ?>
+<system>
+    <config>
+        <curtemplateId>{template_id}</curtemplateId>
+        <weightOffset>0</weightOffset>
+        <waterOffset>0</waterOffset>
+    </config>
+    <templates>
+        <template id="1"><scores enable="0"/><detectors/></template>
+        <template id="22"><scores enable="0"/><detectors/></template>
+    </templates>
+</system>
+"""
+
+
+class ConfigReloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.config_path = os.path.join(self.tmp_dir.name, "config.xml")
+        self._write_config("1")
+        self.manager = DataManager(self.config_path, refresh_delay=0.0)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write_config(self, template_id: str):
+        with open(self.config_path, "w", encoding="utf-8") as f:
+            f.write(CONFIG_XML.format(template_id=template_id))
+
+    def _wait_background_reload(self):
+        # 后台线程加载完成后释放_reload_lock
+        self.assertTrue(self.manager._reload_lock.acquire(timeout=5))
+        self.manager._reload_lock.release()
+
+    def test_unchanged_file_is_not_reparsed(self):
+        version = self.manager.config_manager.version
+        self.assertFalse(self.manager.reload_if_changed())
+        self.assertTrue(self.manager.reload_config())
+        self.assertEqual(self.manager.config_manager.version, version)
+
+        # 显式的强制重新加载总是重新解析
+        self.assertTrue(self.manager.reload_config(force=True))
+        self.assertEqual(self.manager.config_manager.version, version + 1)
+
+    def test_background_reload_picks_up_changes(self):
+        self._write_config("22")
+        self.assertTrue(self.manager.reload_if_changed())
+        self._wait_background_reload()
+        self.assertEqual(self.manager.cur_template_id, "22")
+        self.assertIsNotNone(self.manager._get_current_template())
+
+    def test_manual_reload_waits_for_background_reload(self):
+        self._write_config("22")
+        config_lock = self.manager.config_manager.lock
+        version = self.manager.config_manager.version
+
+        # 配置接口持有ConfigManager.lock修改XML期间，后台重新加载停在解析之前
+        with config_lock:
+            self.assertTrue(self.manager.reload_if_changed())
+            time.sleep(0.1)
+            self.assertEqual(self.manager.config_manager.version, version)
+            self.assertEqual(self.manager.cur_template_id, "1")
+
+            # 手动重新加载等待后台重新加载释放_reload_lock
+            result = []
+            manual = threading.Thread(target=lambda: result.append(self.manager.reload_config()))
+            manual.start()
+            time.sleep(0.1)
+            self.assertTrue(manual.is_alive())
+
+        manual.join(timeout=5)
+        self.assertEqual(result, [True])
+        # 后台线程已加载新文件，手动重新加载发现文件未再变化，不重复解析
+        self.assertEqual(self.manager.config_manager.version, version + 1)
+        self.assertEqual(self.manager.cur_template_id, "22")
+        self._wait_background_reload()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+"""
+事件数据库：旧版本ISO字符串时间/JSON列的表在启动时迁移为整数时间与BLOB列
+"""
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+from array import array
+from datetime import date, datetime
+
+from services.events.storage import OptimizedEventDataStore, _to_epoch_us
+
+# 旧版本的表结构（时间为ISO字符串，通道号/脉冲时间戳为JSON文本）
+LEGACY_SCHEMA = """
+CREATE TABLE sorting_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, event_id TEXT NOT NULL UNIQUE, event_type TEXT NOT NULL,
+    sorting_type TEXT NOT NULL, channels TEXT NOT NULL, count INTEGER NOT NULL DEFAULT 1, weight REAL,
+    grade INTEGER, timestamp TIMESTAMP NOT NULL, source_data TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+CREATE TABLE communication_status_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, event_id TEXT NOT NULL UNIQUE, device_name TEXT NOT NULL,
+    old_status TEXT, new_status TEXT NOT NULL, error_message TEXT, connection_info TEXT,
+    timestamp TIMESTAMP NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+CREATE TABLE pulse_frequency_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, event_id TEXT NOT NULL UNIQUE, frequency REAL NOT NULL,
+    period REAL NOT NULL, pulse_count INTEGER NOT NULL, measurement_duration REAL NOT NULL,
+    timestamp TIMESTAMP NOT NULL, pulse_data TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+CREATE TABLE event_statistics (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, date DATE NOT NULL, event_type TEXT NOT NULL,
+    total_count INTEGER NOT NULL DEFAULT 0, avg_frequency REAL, error_count INTEGER DEFAULT 0,
+    success_count INTEGER DEFAULT 0, UNIQUE (date, event_type));
+CREATE INDEX idx_sorting_events_timestamp ON sorting_events(timestamp);
+CREATE INDEX idx_statistics_date ON event_statistics(date);
+"""
+
+
+class LegacyEventMigrationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "events.db")
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript(LEGACY_SCHEMA)
+            conn.execute(
+                "INSERT INTO sorting_events (event_id, event_type, sorting_type, channels, count, weight, grade, "
+                "timestamp, source_data) VALUES ('s1', 'sorting', 'weight', '[1, 3]', 2, 1.5, 2, "
+                "'2025-01-02T03:04:05.123456', '{}')"
+            )
+            conn.execute(
+                "INSERT INTO communication_status_events (event_id, device_name, old_status, new_status, timestamp) "
+                "VALUES ('c1', 'plc', 'connected', 'disconnected', '2025-01-02T03:04:06')"
+            )
+            conn.execute(
+                "INSERT INTO pulse_frequency_events (event_id, frequency, period, pulse_count, measurement_duration, "
+                "timestamp, pulse_data) VALUES ('p1', 10.0, 0.1, 2, 0.2, '2025-01-02T03:04:07', '[0.1, 0.2]'), "
+                "('p2', 10.0, 0.1, 0, 0.2, '2025-01-02T03:04:08', '[]')"
+            )
+            conn.execute(
+                "INSERT INTO event_statistics (date, event_type, total_count, success_count) "
+                "VALUES ('2025-01-02', 'sorting', 5, 5)"
+            )
+        conn.close()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _open(self) -> OptimizedEventDataStore:
+        with self.assertLogs('services.events.storage', level='INFO'):
+            return OptimizedEventDataStore(self.db_path)
+
+    def _query(self, sql: str):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+    def test_legacy_rows_are_converted(self):
+        self._open()
+
+        channels, timestamp = self._query("SELECT channels, timestamp FROM sorting_events")[0]
+        self.assertEqual(array('i', channels).tolist(), [1, 3])
+        self.assertEqual(timestamp, _to_epoch_us(datetime(2025, 1, 2, 3, 4, 5, 123456)))
+
+        self.assertEqual(self._query("SELECT timestamp FROM communication_status_events"),
+                         [(_to_epoch_us(datetime(2025, 1, 2, 3, 4, 6)),)])
+
+        pulse_rows = self._query("SELECT pulse_data FROM pulse_frequency_events ORDER BY id")
+        self.assertEqual(array('d', pulse_rows[0][0]).tolist(), [0.1, 0.2])
+        self.assertIsNone(pulse_rows[1][0])
+
+        self.assertEqual(self._query("SELECT date, total_count FROM event_statistics"),
+                         [(date(2025, 1, 2).toordinal(), 5)])
+
+        # 旧表已删除，同名索引建在新表上
+        self.assertEqual(self._query("SELECT name FROM sqlite_master WHERE name LIKE '%legacy%'"), [])
+        self.assertEqual(self._query("SELECT tbl_name FROM sqlite_master WHERE name = 'idx_sorting_events_timestamp'"),
+                         [('sorting_events',)])
+
+    def test_migrated_rows_sort_and_filter_with_new_rows(self):
+        store = self._open()
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(
+                "INSERT INTO sorting_events (event_id, event_type, sorting_type, channels, count, timestamp) "
+                "VALUES ('s2', 'sorting', 'weight', ?, 1, ?)",
+                (array('i', [2]).tobytes(), _to_epoch_us(datetime(2025, 1, 3)))
+            )
+        conn.close()
+
+        async def query():
+            try:
+                return (await store.get_sorting_events(limit=10),
+                        await store.get_sorting_events(start_time=datetime(2025, 1, 2, 12), limit=10))
+            finally:
+                await store.pool.close()
+
+        all_events, later_events = asyncio.run(query())
+        self.assertEqual([record.event_id for record in all_events], ['s2', 's1'])
+        self.assertEqual(all_events[1].channels, [1, 3])
+        self.assertEqual(all_events[1].timestamp, datetime(2025, 1, 2, 3, 4, 5, 123456))
+        self.assertEqual([record.event_id for record in later_events], ['s2'])
+
+    def test_migration_runs_once(self):
+        self._open()
+        # 第二次启动时表已是新格式，不再迁移也不写日志
+        with self.assertLogs('services.events.storage', level='INFO') as logs:
+            OptimizedEventDataStore(self.db_path)
+        self.assertFalse([line for line in logs.output if '迁移' in line])
+        self.assertEqual(len(self._query("SELECT id FROM sorting_events")), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
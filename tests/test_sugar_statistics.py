@@ -0,0 +1,54 @@
+"""
+糖度日统计：增量累计、由检测记录重建、内存累计三条路径对酸度的计数必须一致
+"""
+
+import os
+import tempfile
+import time
+import unittest
+from datetime import date
+
+from services.sugar.models import SugarDetectionRecord, SugarStatistics
+from services.sugar.sqlite_store import SQLiteSugarDataStore
+
+
+class SugarAcidStatisticsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = SQLiteSugarDataStore(os.path.join(self.tmp_dir.name, "sugar.db"))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def _records(self):
+        now_ns = time.time_ns()
+        return [
+            SugarDetectionRecord(id=0, timestamp_ns=now_ns, sugar_content=12.0, acid_content=1.0),
+            SugarDetectionRecord(id=0, timestamp_ns=now_ns + 1, sugar_content=13.0, acid_content=0.0),
+            SugarDetectionRecord(id=0, timestamp_ns=now_ns + 2, sugar_content=14.0, acid_content=0.0),
+            SugarDetectionRecord(id=0, timestamp_ns=now_ns + 3, sugar_content=15.0, acid_content=None),
+        ]
+
+    def test_zero_acid_is_counted_by_every_path(self):
+        records = self._records()
+        for record in records:
+            self.assertTrue(self.store.persist_detection(record))
+
+        today = date.today()
+        incremental = self.store.get_daily_statistics(today)
+        rebuilt = self.store.rebuild_daily(today)
+        in_memory = SugarStatistics(date=today)
+        for record in records:
+            in_memory.add_record(record)
+
+        for stats in (incremental, rebuilt, in_memory):
+            self.assertEqual(stats.acid_count, 3)
+            self.assertAlmostEqual(stats.acid_sum, 1.0)
+            self.assertAlmostEqual(stats.acid_avg, 1.0 / 3)
+            self.assertEqual(stats.success_count, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
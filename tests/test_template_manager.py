@@ -0,0 +1,135 @@
+"""
+模板筛选：level区间二分查找、得分筛选的整数运算与按公式计算一致、奇偶秒选择out/subout
+"""
+
+import unittest
+import xml.etree.ElementTree as ET
+from fractions import Fraction
+from unittest import mock
+
+from utils import template_manager
+from utils.template_manager import Template, _build_level_lookup, _find_level
+
+SCORES_TEMPLATE = """
+<template id="1">
+    <scores enable="1">
+        <score out="8" subout="9">80</score>
+        <score out="10" subout="11">60</score>
+        <score out="12" subout="13">40</score>
+    </scores>
+    <detectors>
+        <weight wg="50" max="799">
+            <badLevel><level out="1"><min>0</min><max>100</max></level></badLevel>
+            <goodLevel/>
+        </weight>
+        <water wg="50" max="59">
+            <badLevel><level out="2"><min>-10</min><max>5</max></level></badLevel>
+            <goodLevel/>
+        </water>
+    </detectors>
+</template>
+"""
+
+DOMINANT_TEMPLATE = """
+<template id="2">
+    <scores enable="0"/>
+    <detectors>
+        <weight wg="100">
+            <badLevel><level out="1"><min>0</min><max>100</max></level></badLevel>
+            <goodLevel>
+                <level out="16" subout="17"><min>201</min><max>300</max></level>
+                <level out="14" subout="15"><min>101</min><max>200</max></level>
+            </goodLevel>
+        </weight>
+        <water wg="0"><badLevel/><goodLevel/></water>
+    </detectors>
+</template>
+"""
+
+
+def _linear_find(levels, value):
+    """按配置顺序逐个匹配（优化前的查找方式）"""
+    for level in levels:
+        if level["min"] <= value <= level["max"]:
+            return level
+    return None
+
+
+def _seconds_ns(seconds: int) -> int:
+    return seconds * 1_000_000_000 + 123
+
+
+class LevelLookupTest(unittest.TestCase):
+
+    def test_bisect_matches_linear_scan(self):
+        levels = [
+            {"out": 3, "subout": 4, "min": 50, "max": 59},
+            {"out": 1, "subout": 2, "min": 0, "max": 10},
+            {"out": 5, "subout": 6, "min": 11, "max": 11},
+            {"out": 7, "subout": 8, "min": 30, "max": 49},
+        ]
+        lookup = _build_level_lookup(levels)
+        self.assertIsNotNone(lookup[0])
+        for value in range(-5, 70):
+            self.assertIs(_find_level(lookup, value), _linear_find(levels, value), value)
+
+    def test_overlapping_levels_keep_config_order(self):
+        levels = [
+            {"out": 1, "subout": 1, "min": 10, "max": 30},
+            {"out": 2, "subout": 2, "min": 0, "max": 20},
+        ]
+        lookup = _build_level_lookup(levels)
+        self.assertIsNone(lookup[0])
+        for value in range(-5, 35):
+            self.assertIs(_find_level(lookup, value), _linear_find(levels, value), value)
+
+
+class TemplateChannelTest(unittest.TestCase):
+
+    @staticmethod
+    def _template(xml: str) -> Template:
+        return Template(ET.fromstring(xml))
+
+    def test_fixed_point_scores_match_formula(self):
+        template = self._template(SCORES_TEMPLATE)
+        thresholds = [(8, 9, 80), (10, 11, 60), (12, 13, 40)]
+        for weight in range(101, 900, 7):
+            for water in range(6, 70):
+                # 按原公式以精确分数计算得分
+                score = Fraction(50 * weight, 799) + Fraction(50 * water, 59)
+                expected = next(((out, subout) for out, subout, threshold in thresholds if score >= threshold), None)
+                self.assertEqual(template._match_levels(weight, water, False), expected, (weight, water))
+
+    def test_bad_level_takes_priority(self):
+        template = self._template(SCORES_TEMPLATE)
+        self.assertEqual(template._match_levels(50, 40, False), (1, 1))
+        self.assertEqual(template._match_levels(600, 0, False), (2, 2))
+
+    def test_dominant_detector_levels(self):
+        template = self._template(DOMINANT_TEMPLATE)
+        self.assertEqual(template._match_levels(150, 0, False), (14, 15))
+        self.assertEqual(template._match_levels(250, 0, False), (16, 17))
+        self.assertIsNone(template._match_levels(301, 0, False))
+
+    def test_parity_selects_out_or_subout_despite_cache(self):
+        template = self._template(DOMINANT_TEMPLATE)
+        with mock.patch.object(template_manager, 'time_ns', return_value=_seconds_ns(1000)):
+            self.assertEqual(template.get_channel(150, 0), 14)
+        # 同一输入命中缓存，仍按当前秒的奇偶选择
+        with mock.patch.object(template_manager, 'time_ns', return_value=_seconds_ns(1001)):
+            self.assertEqual(template.get_channel(150, 0), 15)
+        # badLevel 只有 out，奇数秒也返回 out
+        with mock.patch.object(template_manager, 'time_ns', return_value=_seconds_ns(1001)):
+            self.assertEqual(template.get_channel(50, 0), 1)
+
+    def test_missing_max_ignores_score_term(self):
+        xml = SCORES_TEMPLATE.replace(' max="59"', '')
+        with self.assertLogs('utils.template_manager', level='WARNING'):
+            template = self._template(xml)
+        # water项不参与计分：得分 = 50 * weight / 799
+        self.assertEqual(template._match_levels(799, 40, False), (12, 13))
+        self.assertIsNone(template._match_levels(600, 40, False))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+"""
+重量数据存储写缓冲：缓冲日志重放与检查点、无法写入的记录隔离
+"""
+
+import math
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from datetime import date
+
+from services.storage.sqlite_store import SQLiteWeightDataStore
+from services.weight.models import WeightDetectionRecord
+
+
+def _record(weight: float, grade: int = 1) -> WeightDetectionRecord:
+    return WeightDetectionRecord(0, time.time_ns(), weight, grade, grade, True)
+
+
+class WeightStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "weight.db")
+        self.store = self._open()
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def _open(self) -> SQLiteWeightDataStore:
+        # 批量大小与间隔足够大，写入时机完全由测试中的flush()控制
+        return SQLiteWeightDataStore(self.db_path, batch_size=10_000, flush_interval=60)
+
+    def _reopen(self):
+        self.store.close()
+        self.store = self._open()
+
+    def _stored_weights(self):
+        with sqlite3.connect(self.db_path) as conn:
+            return [row[0] for row in conn.execute("SELECT weight FROM detection_records ORDER BY id")]
+
+    def _read_log(self) -> str:
+        with open(self.store.pending_log_path, encoding='utf-8') as f:
+            return f.read()
+
+
+class PendingLogReplayTest(WeightStoreTestCase):
+
+    def test_committed_entries_are_not_replayed(self):
+        for weight in (100.0, 110.0, 120.0):
+            self.store.persist_detection(_record(weight))
+        uncommitted_log = self._read_log()
+        self.assertEqual(uncommitted_log.count('\n'), 3)
+
+        self.assertTrue(self.store.flush())
+        self.assertEqual(self._read_log(), "")
+        self.store.close()
+
+        # 模拟提交后、日志重写前进程退出：日志仍是提交前的内容，检查点使重放跳过这些记录
+        with open(self.store.pending_log_path, 'w', encoding='utf-8') as f:
+            f.write(uncommitted_log)
+        self.store = self._open()
+
+        self.assertEqual(self._stored_weights(), [100.0, 110.0, 120.0])
+        self.assertEqual(self._read_log(), "")
+
+    def test_uncommitted_entries_are_replayed_once(self):
+        self.store.persist_detection(_record(100.0))
+        self.assertTrue(self.store.flush())
+        self.store.close()
+
+        # 模拟入队后、提交前进程退出：日志中序号大于检查点的记录
+        with open(self.store.pending_log_path, 'w', encoding='utf-8') as f:
+            f.write(SQLiteWeightDataStore._log_line(_record(130.0), True, 2))
+            f.write(SQLiteWeightDataStore._log_line(_record(140.0, grade=2), True, 3))
+
+        for _ in range(2):
+            self.store = self._open()
+            self.assertEqual(self._stored_weights(), [100.0, 130.0, 140.0])
+            self.assertEqual(self._read_log(), "")
+            self.store.close()
+        self.store = self._open()
+
+        # 重放的记录按入队时的标志累计日统计（第一条记录未累计）
+        statistics = {stats.grade_id: stats.total_count for stats in self.store.get_daily_statistics(date.today())}
+        self.assertEqual(statistics, {1: 2, 2: 1})
+
+        # 重放后新入队的记录序号接在日志之后，不会被检查点误跳过
+        self.store.persist_detection(_record(150.0))
+        self._reopen()
+        self.assertEqual(self._stored_weights(), [100.0, 130.0, 140.0, 150.0])
+
+
+class RecentRecordsTest(WeightStoreTestCase):
+
+    def test_reads_merge_buffer_without_committing(self):
+        self.store.persist_detection(_record(100.0))
+        self.store.persist_detection(_record(110.0))
+        self.assertTrue(self.store.flush())
+        self.store.persist_detection(_record(120.0))
+
+        self.assertEqual([record.weight for record in self.store.get_recent_records(10)], [120.0, 110.0, 100.0])
+        self.assertEqual([record.weight for record in self.store.get_recent_records(2)], [120.0, 110.0])
+        newest = self.store.get_recent_records(1)[0]
+        self.assertEqual([record.weight for record in self.store.get_recent_records_before(newest.timestamp_ns, 10)],
+                         [110.0, 100.0])
+        # 读取不触发写入
+        self.assertEqual(self._stored_weights(), [100.0, 110.0])
+
+
+class PoisonRecordTest(WeightStoreTestCase):
+
+    def test_unwritable_record_is_quarantined(self):
+        # 先载入当日统计视图，隔离时视图中已计入的增量需要撤销
+        self.assertEqual(self.store.get_daily_statistics(date.today()), [])
+        self.store.persist_detection(_record(100.0))
+        self.store.persist_detection(_record(math.nan))
+        self.store.persist_detection(_record(120.0))
+
+        # 重量NaN绑定为NULL违反NOT NULL约束：只隔离该条，其余记录正常写入
+        with self.assertLogs('services.storage.sqlite_store', level='ERROR'):
+            self.assertTrue(self.store.flush())
+        self.assertEqual(self._stored_weights(), [100.0, 120.0])
+        self.assertEqual(self._read_log(), "")
+        with open(self.store.rejected_log_path, encoding='utf-8') as f:
+            self.assertEqual(f.read().count('\n'), 1)
+        statistics = self.store.get_daily_statistics(date.today())
+        self.assertEqual([(stats.grade_id, stats.total_count) for stats in statistics], [(1, 2)])
+        self.assertAlmostEqual(statistics[0].weight_sum, 220.0)
+
+        # 之后的记录不受影响，最近记录可正常读取
+        self.store.persist_detection(_record(130.0))
+        self.assertTrue(self.store.flush())
+        self.assertEqual([record.weight for record in self.store.get_recent_records(10)], [130.0, 120.0, 100.0])
+
+        # 隔离的记录不会在重启时再次重放
+        self._reopen()
+        self.assertEqual(self._stored_weights(), [100.0, 120.0, 130.0])
+
+        # 日统计不含隔离的记录
+        statistics = self.store.get_daily_statistics(date.today())
+        self.assertEqual([(stats.grade_id, stats.total_count) for stats in statistics], [(1, 3)])
+        self.assertAlmostEqual(statistics[0].weight_sum, 350.0)
+
+    def test_poison_record_in_replayed_log_does_not_block_startup(self):
+        self.store.close()
+        with open(self.store.pending_log_path, 'w', encoding='utf-8') as f:
+            f.write(SQLiteWeightDataStore._log_line(_record(math.nan), True, 1))
+            f.write(SQLiteWeightDataStore._log_line(_record(100.0), True, 2))
+        with self.assertLogs('services.storage.sqlite_store', level='ERROR'):
+            self.store = self._open()
+
+        self.assertEqual(self._stored_weights(), [100.0])
+        self.assertEqual(self._read_log(), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
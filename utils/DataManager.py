@@ -1,34 +1,49 @@
 # data_manager.py
 
-from typing import Any, Tuple
+import logging
+import threading
+import time
+from typing import Any, Dict, Tuple
 
 # 假设以下模块已存在于你的项目中
 from .config_manager import ConfigManager
-from .aligned_queue import AlignedQueue
+from .aligned_queue import AlignedQueue, PairedAlignedQueues
 from .template_manager import TemplateManager, Template
 
+logger = logging.getLogger(__name__)
+
 
 class DataManager:
     """
     一个用于管理配置、数据和模板筛选的中央数据管理类。
     """
 
-    def __init__(self, config_file_path: str):
+    def __init__(self, config_file_path: str, refresh_delay: float = 2.0):
         """
         初始化数据管理器。
 
         Args:
             config_file_path (str): XML 配置文件的路径。
+            refresh_delay (float): 两次检查配置文件修改时间的最小间隔（秒）。
         """
         self.config_manager = ConfigManager(config_file_path)
         self.template_manager = None
 
         self.cur_template_id = None
+        # 当前模板缓存，cur_template_id变化或重新加载配置时失效
+        self._cached_template = None
+        self._cached_template_id = None
+
+        # 按refresh_delay节流检查配置文件，文件变化时重新加载
+        self.refresh_delay = refresh_delay
+        self._next_check = 0.0
+        self._reload_lock = threading.Lock()
+
         self.weight_offset = 0
         self.water_offset = 0
 
-        self.weight_queue = {}
-        self.water_queue = {}
+        # 每条产线一组 weight/water 对齐队列
+        self._lines: Dict[str, PairedAlignedQueues] = {}
 
         self._load_all_configs()
 
@@ -36,100 +51,145 @@ class DataManager:
         """
         从配置文件中加载所有配置和模板。
         """
-        if self.config_manager.load_config():
-            # 1. 从配置文件中获取当前模板ID和所有offset
-            self.cur_template_id = self.config_manager.get_config_value('config/curtemplateId')
+        # 解析文件到模板构建完成期间持有 ConfigManager.lock，配置接口不会在中途修改或写回XML树
+        with self.config_manager.lock:
+            if self.config_manager.load_config():
+                # 1. 从配置文件中获取当前模板ID和所有offset
+                cur_template_id = self.config_manager.get_config_value('config/curtemplateId')
+
+                weight_offset_str = self.config_manager.get_config_value('config/weightOffset')
+                weight_offset = int(weight_offset_str) if weight_offset_str else 0
+
+                water_offset_str = self.config_manager.get_config_value('config/waterOffset')
+                water_offset = int(water_offset_str) if water_offset_str else 0
+
+                logger.info("配置文件参数加载成功：当前模板ID=%s, weight_offset=%d, water_offset=%d",
+                            cur_template_id, weight_offset, water_offset)
 
-            weight_offset_str = self.config_manager.get_config_value('config/weightOffset')
-            self.weight_offset = int(weight_offset_str) if weight_offset_str else 0
+                # 2. 如果offset大于0，创建AlignedQueue队列
+                # if self.weight_offset > 0:
+                #     self.weight_queue = AlignedQueue(max_length=self.weight_offset + 10)
+                # if self.water_offset > 0:
+                #     self.water_queue = AlignedQueue(max_length=self.water_offset + 10)
 
-            water_offset_str = self.config_manager.get_config_value('config/waterOffset')
-            self.water_offset = int(water_offset_str) if water_offset_str else 0
+                # 3. 初始化模板管理器，全部解析完成后再替换，
+                #    后台重新加载期间 set_value 一直使用旧模板
+                template_manager = TemplateManager(self.config_manager)
+                self.template_manager = template_manager
+                self._cached_template = template_manager.get_template(cur_template_id)
+                self._cached_template_id = cur_template_id
+                self.cur_template_id = cur_template_id
+                self.weight_offset = weight_offset
+                self.water_offset = water_offset
+                return True
+            return False
 
-            print(f"配置文件参数加载成功：当前模板ID={self.cur_template_id}, "
-                  f"weight_offset={self.weight_offset}, water_offset={self.water_offset}")
+    def _get_current_template(self) -> Template | None:
+        """返回当前模板，cur_template_id被外部修改时重新查找。"""
+        if self._cached_template_id != self.cur_template_id:
+            self._cached_template = self.template_manager.get_template(self.cur_template_id)
+            self._cached_template_id = self.cur_template_id
+        return self._cached_template
 
-            # 2. 如果offset大于0，创建AlignedQueue队列
-            # if self.weight_offset > 0:
-            #     self.weight_queue = AlignedQueue(max_length=self.weight_offset + 10)
-            # if self.water_offset > 0:
-            #     self.water_queue = AlignedQueue(max_length=self.water_offset + 10)
+    def reload_if_changed(self) -> bool:
+        """
+        配置文件修改时间或大小变化时在后台线程重新加载配置，两次检查至少间隔 refresh_delay 秒。
+        解析配置和模板不占用调用方（set_value）的时间，加载完成前继续使用旧模板。
+
+        Returns:
+            bool: 如果开始了重新加载，返回 True。
+        """
+        now = time.monotonic()
+        if now < self._next_check or not self._reload_lock.acquire(blocking=False):
+            return False
+        started = False
+        try:
+            self._next_check = now + self.refresh_delay
+            if self.config_manager.is_modified():
+                # 锁交给后台线程，加载完成后释放，期间不会重复启动
+                threading.Thread(target=self._reload_in_background, name="config-reload", daemon=True).start()
+                started = True
+            return started
+        finally:
+            if not started:
+                self._reload_lock.release()
 
-            # 3. 初始化模板管理器
-            self.template_manager = TemplateManager(self.config_manager)
+    def _reload_in_background(self):
+        """后台线程：重新加载配置，完成后释放 _reload_lock。"""
+        try:
+            if not self._load_all_configs():
+                logger.error("配置重新加载失败。")
+        except Exception:
+            logger.exception("后台重新加载配置出错。")
+        finally:
+            self._reload_lock.release()
 
-    def set_value(self, line_id: str, value_name: str, value: Any, position: int) -> int | None:
+    def set_value(self, line_id: str, value_name: str, value: int | float, position: int) -> int | None:
         """
         设置 weight 或 water 的值。
 
         Args:
             value_name (str): 'weight' 或 'water'。
-            value (Any): 要设置的值。
+            value (int | float): 要设置的值，入口处统一转为 int，入队的值不再重复转换。
             position (int): 数据的位置。
 
         Returns:
             int | None: 如果成功筛选，返回通道号；否则返回 None。
         """
+        self.reload_if_changed()
+        value = int(value)
+
         if value_name == 'weight':
             offset = self.weight_offset
-            if line_id not in self.weight_queue:
-                self.weight_queue[line_id] = AlignedQueue(max_length=offset + 10)
-            queue = self.weight_queue[line_id]
         elif value_name == 'water':
             offset = self.water_offset
-            if line_id not in self.water_queue:
-                self.water_queue[line_id] = AlignedQueue(max_length=offset + 10)
-            queue = self.water_queue[line_id]
         else:
-            print(f"错误：不支持的数据类型 '{value_name}'。")
+            logger.error("不支持的数据类型 '%s'。", value_name)
             return None
 
+        # 只有需要入队时才创建产线的队列，offset为0的筛选路径只读取另一信号的队列
+        queues = self._lines.get(line_id)
+
         # 4. 当offset大于0时，将值存入AlignedQueue
         if offset > 0:
-            if queue is None:
-                print(f"错误：'{value_name}' 的队列未初始化。")
-                return None
-
+            if queues is None:
+                queues = self._lines[line_id] = PairedAlignedQueues(self.weight_offset + 10, self.water_offset + 10)
+            queue = queues.weight if value_name == 'weight' else queues.water
             queue.put(data=value, position=position)
-            print(f"'{value_name}' 值 {value} 已存入队列，位置 {position}。")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("'%s' 值 %s 已存入队列，位置 %d。", value_name, value, position)
             return None  # 队列操作，不返回通道号
 
         # 5. 当offset等于0时，进行筛选
         elif offset == 0:
-            print(f"'{value_name}' 值 {value} 进行筛选，位置 {position}，模板 {self.cur_template_id}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("'%s' 值 %s 进行筛选，位置 %d，模板 %s", value_name, value, position, self.cur_template_id)
             # 获取当前模板
-            current_template = self.template_manager.get_template(self.cur_template_id)
+            current_template = self._get_current_template()
             if not current_template:
-                print(f"错误：未找到ID为 '{self.cur_template_id}' 的模板。")
+                logger.error("未找到ID为 '%s' 的模板。", self.cur_template_id)
                 return None
 
             # 获取另一个值
             if value_name == 'weight':
-                water_value = self._get_offset_value(line_id, 'water', position)
+                water_value = self._get_offset_value(queues and queues.water, self.water_offset, position)
                 if water_value is None:
-                    print(f"错误：未找到water_value position:{position}")
+                    logger.warning("未找到water_value position:%d", position)
                     water_value = -100
                     # return None
-                return current_template.get_channel(weight_value=int(value), water_value=int(water_value))
+                return current_template.get_channel(weight_value=value, water_value=water_value)
 
             elif value_name == 'water':
-                weight_value = self._get_offset_value(line_id, 'weight', position)
+                weight_value = self._get_offset_value(queues and queues.weight, self.weight_offset, position)
                 if weight_value is None: return None
-                return current_template.get_channel(weight_value=int(weight_value), water_value=int(value))
+                return current_template.get_channel(weight_value=weight_value, water_value=value)
 
-    def _get_offset_value(self, line_id: str, value_name: str, current_position: int) -> Any | None:
+    def _get_offset_value(self, queue: AlignedQueue | None, offset: int, current_position: int) -> Any | None:
         """
         获取队列中对应位置的值。
         """
-        if value_name == 'weight':
-            queue = self.weight_queue.get(line_id)
-            offset = self.weight_offset
-        else:  # 'water'
-            queue = self.water_queue.get(line_id)
-            offset = self.water_offset
-
-        # 2. 如果队列不存在，直接返回 None
-        if not queue:
+        # 产线的队列尚未创建（另一信号还没有入队过）
+        if queue is None:
             return None
 
         # 计算对齐位置
@@ -144,14 +204,27 @@ class DataManager:
             # print(f"错误：未能在位置 {current_position} 找到与 '{value_name}' 对应的对齐数据。")
             return None
 
-    def reload_config(self):
+    def reload_config(self, force: bool = False) -> bool:
         """
-        手动重新加载配置，并根据版本号决定是否更新。
+        手动重新加载配置。
+
+        Args:
+            force (bool): 为 True 时总是重新解析；否则文件未变化时跳过解析。
+                文件变化可能已被后台重新加载处理，显式的重新加载请求应传 True。
+
+        Returns:
+            bool: 配置已是最新（重新加载成功或文件未变化）时返回 True，加载失败返回 False。
         """
-        if self._load_all_configs():
-            print("配置更新成功。")
-        else:
-            print("配置已是最新版本。")
+        # 与后台重新加载互斥，正在加载时等待其完成
+        with self._reload_lock:
+            if not force and not self.config_manager.is_modified():
+                logger.info("配置已是最新版本。")
+                return True
+            if self._load_all_configs():
+                logger.info("配置更新成功，版本: %d", self.config_manager.version)
+                return True
+        logger.error("配置重新加载失败。")
+        return False
 
 # --- 示例用法 ---
 # if __name__ == "__main__":
@@ -1,19 +1,35 @@
 # __init__.py
 
-from .DataManager import DataManager
-from .config_manager import ConfigManager
-from .template_manager import TemplateManager, Template
+# DataManager / ConfigManager / TemplateManager 按需导入，
+# 只需要 get_data_manager 的模块（检测器、分拣任务）导入 utils 时不加载XML相关模块
+_LAZY_IMPORTS = {
+    'DataManager': '.DataManager',
+    'ConfigManager': '.config_manager',
+    'TemplateManager': '.template_manager',
+    'Template': '.template_manager',
+}
 
-# 实例化 DataManager 类
-# 注意：这里的 'config.xml' 需要根据你的实际文件路径进行修改
-# data_manager = DataManager('config.xml')
 
-# 或者，如果你希望延迟初始化，可以这么做：
+def _load(name):
+    from importlib import import_module
+    value = getattr(import_module(_LAZY_IMPORTS[name], __name__), name)
+    # 导入子模块 utils.DataManager 时包属性会被设为模块本身，这里改回同名的类
+    globals()[name] = value
+    return value
+
+
+def __getattr__(name):
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return _load(name)
+
+
+# 延迟初始化的全局 DataManager 实例
 _data_manager = None
 def init_data_manager(file_name):
     global _data_manager
     if _data_manager is None:
-        _data_manager = DataManager(file_name)
+        _data_manager = _load('DataManager')(file_name)
     return _data_manager
 
 def get_data_manager():
@@ -28,4 +44,4 @@ __all__ = [
     'Template',
     'init_data_manager',
     'get_data_manager'
-]
\ No newline at end of file
+]
@@ -1,5 +1,9 @@
-from collections import deque
-from typing import Any, Tuple
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
 
 
 class AlignedQueue:
@@ -7,6 +11,8 @@ class AlignedQueue:
     一个先进先出队列，具有对齐取数功能。
     """
 
+    __slots__ = ('_ring', '_head', '_count', '_index')
+
     def __init__(self, max_length: int):
         """
         初始化队列。
@@ -17,7 +23,11 @@ class AlignedQueue:
         if not isinstance(max_length, int) or max_length <= 0:
             raise ValueError("队列最大长度必须是大于0的整数。")
 
-        self._queue = deque(maxlen=max_length)
+        # 位置按写入顺序存放在预分配的环形缓冲中，用于淘汰最旧的数据；数据按位置索引，对齐取数为O(1)
+        self._ring: List[Optional[int]] = [None] * max_length
+        self._head = 0
+        self._count = 0
+        self._index: Dict[int, Any] = {}
 
     def put(self, data: Any, position: int):
         """
@@ -27,7 +37,21 @@ class AlignedQueue:
             data (Any): 要放入队列的数据。
             position (int): 数据的位置。
         """
-        self._queue.append((data, position))
+        if position in self._index:
+            # 同一位置重复写入，以最新数据为准
+            self._index[position] = data
+            return
+
+        ring = self._ring
+        if self._count == len(ring):
+            # 队列已满，覆盖最旧的位置并同步删除其数据
+            self._index.pop(ring[self._head], None)
+            ring[self._head] = position
+            self._head = (self._head + 1) % len(ring)
+        else:
+            ring[(self._head + self._count) % len(ring)] = position
+            self._count += 1
+        self._index[position] = data
 
     def get_aligned(self, alignment_position: int) -> Tuple[Any, int] | None:
         """
@@ -39,80 +63,43 @@ class AlignedQueue:
         Returns:
             Tuple[Any, int] | None: 如果成功对齐并取出，返回 (数据, 位置)；如果队列为空或发生错误，返回 None。
         """
-        # 如果队列为空，直接返回 None
-        if not self._queue:
+        data = self._index.pop(alignment_position, _MISSING)
+
+        # 对齐位置之前（含对齐位置）的数据已过期，从队首丢弃
+        ring = self._ring
+        while self._count and ring[self._head] <= alignment_position:
+            self._index.pop(ring[self._head], None)
+            ring[self._head] = None
+            self._head = (self._head + 1) % len(ring)
+            self._count -= 1
+
+        if data is _MISSING:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("对齐位置 %d 没有对应的数据", alignment_position)
             return None
-
-        while self._queue:
-            # 查看队首元素，但先不取出
-            data, current_position = self._queue[0]
-
-            if alignment_position == current_position:
-                # 对齐规则1：如果传入位置与当前位置相等，则为已对齐，取出当前数
-                return self._queue.popleft()
-            elif alignment_position < current_position:
-                # 对齐规则2：如果传入位置比当前位置小，为错误情况，中断取数
-                print(f"取数错误：传入位置 {alignment_position} 小于当前位置 {current_position}。")
-                return None
-            else:  # alignment_position > current_position
-                # 对齐规则3：如果传入位置比当前位置大，继续取下一个数
-                print(f"对齐位置 {alignment_position} 大于当前位置 {current_position}，继续取下一个数。")
-                self._queue.popleft()
-
-        # 遍历完队列后没有找到对齐的元素
-        return None
+        return data, alignment_position
 
     def size(self) -> int:
         """返回队列当前的大小。"""
-        return len(self._queue)
+        return len(self._index)
 
     def is_empty(self) -> bool:
         """检查队列是否为空。"""
-        return not self._queue
-
-
-# --- 示例用法 ---
-print("--- 创建并使用队列 ---")
-# 创建一个最大长度为5的队列
-my_queue = AlignedQueue(max_length=5)
-
-# 放入一些数据
-print("向队列中放入数据...")
-my_queue.put("数据A", 100)
-my_queue.put("数据B", 101)
-my_queue.put("数据C", 103)
-my_queue.put("数据D", 104)
-print(f"当前队列大小：{my_queue.size()}")
-print("-" * 20)
-
-# 示例1: 成功对齐取数
-print("--- 示例1: 成功对齐取数（对齐位置 101）---")
-retrieved_item = my_queue.get_aligned(101)
-if retrieved_item:
-    data, pos = retrieved_item
-    print(f"成功取出元素：数据='{data}', 位置={pos}")
-print(f"队列剩余大小：{my_queue.size()}")
-print("-" * 20)
-
-# 示例2: 传入位置小于当前位置，取数失败
-print("--- 示例2: 传入位置小于当前位置，取数失败（对齐位置 100）---")
-retrieved_item = my_queue.get_aligned(100)
-if retrieved_item is None:
-    print("取数操作因错误而中断。")
-print(f"队列剩余大小：{my_queue.size()}")
-print("-" * 20)
-
-# 示例3: 跳过元素后对齐取数
-print("--- 示例3: 跳过元素后对齐取数（对齐位置 104）---")
-retrieved_item = my_queue.get_aligned(104)
-if retrieved_item:
-    data, pos = retrieved_item
-    print(f"成功取出元素：数据='{data}', 位置={pos}")
-print(f"队列剩余大小：{my_queue.size()}")
-print("-" * 20)
-
-# 示例4: 队列中没有对齐的元素
-print("--- 示例4: 队列中没有对齐的元素（对齐位置 109）---")
-retrieved_item = my_queue.get_aligned(109)
-if retrieved_item is None:
-    print("队列中没有找到与给定位置对齐的元素。")
\ No newline at end of file
+        return not self._index
+
+
+class PairedAlignedQueues:
+    """
+    同一条产线的 weight 和 water 对齐队列，按产线只需一次字典查找。
+    """
+
+    __slots__ = ('weight', 'water')
+
+    def __init__(self, weight_length: int, water_length: int):
+        """
+        Args:
+            weight_length (int): weight 队列的最大长度。
+            water_length (int): water 队列的最大长度。
+        """
+        self.weight = AlignedQueue(weight_length)
+        self.water = AlignedQueue(water_length)
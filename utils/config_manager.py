@@ -1,5 +1,7 @@
 # config_manager.py
 
+import os
+import threading
 import xml.etree.ElementTree as ET
 from typing import Any, Tuple, Dict, List
 
@@ -12,12 +14,36 @@ class ConfigManager:
         self.file_path = file_path
         self.tree = None
         self.root = None
+        # 加载时配置文件的修改时间(ns)和 (修改时间, 大小) 标识，用于判断文件是否变化
+        self.mtime = None
+        self._file_key: Tuple[int, int] | None = None
+        # 每次成功解析加1，下游缓存可据此判断是否失效
+        self.version = 0
+        # 查询结果缓存，键中包含文件修改时间，写回文件后自动失效
+        self._cache: Dict[Tuple[str, Any, int], Any] = {}
+        # 替换 tree/root（重新加载）与 修改root再写回文件 必须持有此锁，
+        # 避免修改写到即将被替换的旧树上而丢失；可重入，便于在持锁期间重新加载
+        self.lock = threading.RLock()
 
-    def load_config(self) -> bool:
-        """加载 XML 配置文件。"""
+    def load_config(self, force: bool = True) -> bool:
+        """
+        加载 XML 配置文件。
+
+        Args:
+            force (bool): 为 False 时，已加载且文件未变化则不重新解析，直接返回 True。
+        """
         try:
-            self.tree = ET.parse(self.file_path)
-            self.root = self.tree.getroot()
+            with self.lock:
+                if not force and self.root is not None and not self.is_modified():
+                    return True
+                # 先取文件标识再解析，解析期间文件被改写时下次检查仍能发现
+                st = os.stat(self.file_path)
+                self.tree = ET.parse(self.file_path)
+                self.root = self.tree.getroot()
+                self.mtime = st.st_mtime_ns
+                self._file_key = (st.st_mtime_ns, st.st_size)
+                self.version += 1
+                self._cache.clear()
             print(f"配置文件 {self.file_path} 加载成功。")
             return True
         except FileNotFoundError:
@@ -27,6 +53,25 @@ class ConfigManager:
             print(f"错误: 解析配置文件 {self.file_path} 失败。文件格式不正确。")
             return False
 
+    def is_modified(self) -> bool:
+        """配置文件的修改时间或大小与上次加载时不同则返回 True，只需一次 stat。"""
+        try:
+            st = os.stat(self.file_path)
+        except OSError:
+            return False
+        return (st.st_mtime_ns, st.st_size) != self._file_key
+
+    def _cache_key(self, name: str, arg: Any = None) -> Tuple[str, Any, int] | None:
+        """以当前文件修改时间构造缓存键，文件不可访问时返回 None（不使用缓存）。"""
+        try:
+            mtime = os.stat(self.file_path).st_mtime_ns
+        except OSError:
+            return None
+        if self._cache and next(iter(self._cache))[2] != mtime:
+            # 文件已被改写，旧缓存全部作废
+            self._cache.clear()
+        return name, arg, mtime
+
     def get_templates_elements(self) -> Dict[str, ET.Element]:
         """
         获取所有模板的XML元素，以模板ID为键存储在字典中。
@@ -38,6 +83,10 @@ class ConfigManager:
             print("错误: 配置文件尚未加载。")
             return {}
 
+        key = self._cache_key('templates')
+        if key in self._cache:
+            return dict(self._cache[key])
+
         templates_dict = {}
         templates_element = self.root.find('templates')
         if templates_element is not None:
@@ -45,7 +94,9 @@ class ConfigManager:
                 template_id = template_elem.attrib.get('id')
                 if template_id:
                     templates_dict[template_id] = template_elem
-        return templates_dict
+        if key is not None:
+            self._cache[key] = templates_dict
+        return dict(templates_dict)
 
     def get_config_value(self, element_path: str) -> str | None:
         """根据 XML 路径获取配置值。"""
@@ -70,8 +121,35 @@ class ConfigManager:
             print("错误: 配置文件尚未加载。")
             return None
 
+        key = self._cache_key('water_detector', channel_id)
+        if key in self._cache:
+            return self._cache[key]
+
+        result = self._find_water_detector_config(channel_id)
+        if key is not None:
+            self._cache[key] = result
+        return result
+
+    def _get_channel_elements(self) -> Dict[str, ET.Element]:
+        """
+        一次遍历建立通道ID到通道元素的映射。
+        使用固定路径，避免每个通道ID各拼一条带谓词的XPath再由ElementPath重新编译。
+        """
+        key = self._cache_key('channels')
+        if key in self._cache:
+            return self._cache[key]
+
+        channels = {}
+        for channel_elem in self.root.iterfind('channels/channel'):
+            channels.setdefault(channel_elem.attrib.get('id'), channel_elem)
+        if key is not None:
+            self._cache[key] = channels
+        return channels
+
+    def _find_water_detector_config(self, channel_id: str) -> Tuple[str, int] | None:
+        """在XML树中查找通道的water传感器配置。"""
         # 查找指定ID的通道元素
-        channel_element = self.root.find(f'./channels/channel[@id="{channel_id}"]')
+        channel_element = self._get_channel_elements().get(channel_id)
         if channel_element is None:
             print(f"警告: 未找到ID为 '{channel_id}' 的通道。")
             return None
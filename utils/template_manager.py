@@ -1,12 +1,58 @@
 # template_manager.py
 
+import logging
+from bisect import bisect_right
+from functools import lru_cache
+from time import time_ns
 import xml.etree.ElementTree as ET
-from datetime import datetime
 from typing import Dict, Any
 
 # 假设 config_manager 模块在同一目录下
 from .config_manager import ConfigManager
 
+logger = logging.getLogger(__name__)
+
+# 检测器下标：按 (weight, water) 顺序存放的各类表都用这两个下标访问
+WEIGHT_IDX = 0
+WATER_IDX = 1
+_DETECTOR_NAMES = ("weight", "water")
+
+# 每个模板缓存最近的 (weight, water) -> (out, subout) 匹配结果条数
+CHANNEL_CACHE_SIZE = 1024
+
+
+def _to_int(value: str | None) -> int | None:
+    """XML属性/文本转为 int，缺失或为空时返回 None。"""
+    return int(value) if value else None
+
+
+def _build_level_lookup(levels: list[dict]) -> tuple:
+    """
+    将 level 列表整理为 (mins, maxs, levels) 查找表，区间按 min 排序，可二分查找。
+    区间有重叠时结果取决于配置顺序，返回 (None, None, levels) 表示按原顺序逐个匹配。
+    """
+    ordered = sorted(levels, key=lambda level: level["min"])
+    for prev, cur in zip(ordered, ordered[1:]):
+        if cur["min"] <= prev["max"]:
+            return None, None, levels
+    return (tuple(level["min"] for level in ordered),
+            tuple(level["max"] for level in ordered),
+            tuple(ordered))
+
+
+def _find_level(lookup: tuple, value: int) -> dict | None:
+    """在 _build_level_lookup 生成的查找表中找到包含 value 的 level。"""
+    mins, maxs, levels = lookup
+    if mins is None:
+        for level in levels:
+            if level["min"] <= value <= level["max"]:
+                return level
+        return None
+    i = bisect_right(mins, value)
+    if i and value <= maxs[i - 1]:
+        return levels[i - 1]
+    return None
+
 
 class Template:
     """
@@ -14,6 +60,11 @@ class Template:
     这个类现在直接从内存中的XML元素初始化。
     """
 
+    __slots__ = ("template_id", "_scores_enabled", "_detectors", "_scores_config",
+                 "_scores_sorted", "_wg_weight", "_wg_water", "_weight_max", "_water_max",
+                 "_denom", "_score_thresholds_scaled", "_dominant", "_select_channel",
+                 "_bad_lookups", "_match_levels_cached")
+
     def __init__(self, template_element: ET.Element):
         """
         初始化模板实例。
@@ -26,7 +77,25 @@ class Template:
         self._detectors = {}
         self._scores_config = []
 
+        # 以下在解析时一次算好，get_channel 中只做整数比较和运算
+        self._scores_sorted = []  # 按分数从高到低排列的 (out, subout, score)
+        self._wg_weight = 0
+        self._wg_water = 0
+        self._weight_max = 1
+        self._water_max = 1
+        # 得分两边同乘 weight_max * water_max 后的阈值，得分筛选全程整数运算
+        self._denom = 1
+        self._score_thresholds_scaled = []  # (out, subout, score * denom)
+        # scores 禁用时起决定作用（wg为100）的检测器：(名称, 检测器下标, goodLevel 查找表)
+        self._dominant = None
+        self._select_channel = self._no_channel
+        # 按 WEIGHT_IDX / WATER_IDX 排列的 badLevel 查找表，未配置的检测器为 None
+        self._bad_lookups = (None, None)
+
         self._parse_template(template_element)
+        # 匹配结果只取决于输入值，与奇偶秒无关，缓存到选出 (out, subout) 为止；
+        # 重新加载配置时整组 Template 被替换，缓存随之失效
+        self._match_levels_cached = lru_cache(maxsize=CHANNEL_CACHE_SIZE)(self._match_levels)
 
     def _parse_template(self, template_element: ET.Element):
         """解析模板的XML元素，并将其转换为内存数据。"""
@@ -35,9 +104,11 @@ class Template:
         if scores_element is not None:
             self._scores_enabled = scores_element.attrib.get("enable") == "1"
             self._scores_config = [
-                (e.attrib.get('out'), e.attrib.get('subout'), int(e.text))
+                (_to_int(e.attrib.get('out')), _to_int(e.attrib.get('subout')), int(e.text))
                 for e in scores_element.findall('score')
             ]
+            # 稳定排序，同分时保持配置中的先后顺序
+            self._scores_sorted = sorted(self._scores_config, key=lambda x: x[2], reverse=True)
 
         # 解析 <detectors> 配置
         detectors_element = template_element.find("detectors")
@@ -51,6 +122,49 @@ class Template:
                     "goodLevel": self._parse_levels(detector_elem.find("goodLevel")),
                 }
 
+        # 得分筛选用的权重和分母
+        weight_detector = self._detectors.get("weight", {})
+        water_detector = self._detectors.get("water", {})
+        self._wg_weight, self._weight_max = self._score_term(weight_detector, "weight")
+        self._wg_water, self._water_max = self._score_term(water_detector, "water")
+        self._denom = self._weight_max * self._water_max
+        self._score_thresholds_scaled = [
+            (out, subout, s_score * self._denom) for out, subout, s_score in self._scores_sorted
+        ]
+
+        self._bad_lookups = tuple(
+            _build_level_lookup(self._detectors[name]["badLevel"]) if name in self._detectors else None
+            for name in _DETECTOR_NAMES
+        )
+
+        for name, detector in self._detectors.items():
+            if detector.get("wg") == "100":
+                # 非 weight 的检测器沿用原逻辑，按 water 值判定
+                index = WEIGHT_IDX if name == "weight" else WATER_IDX
+                self._dominant = (name, index, _build_level_lookup(detector["goodLevel"]))
+                break
+
+        # 模板形态在加载后不变，提前选定 badLevel 之后的筛选方法，get_channel 中不再判断
+        if self._scores_enabled:
+            self._select_channel = self._channel_by_scores
+        elif self._dominant is not None:
+            self._select_channel = self._channel_by_dominant
+        else:
+            self._select_channel = self._no_channel
+
+    def _score_term(self, detector: dict, detector_name: str) -> tuple[int, int]:
+        """
+        返回检测器在得分公式中的 (权重, 分母)。
+        未配置 max（或不为正数）时该项不参与计分，返回 (0, 1)，避免除零，也保证放大后的阈值比较方向不变。
+        """
+        wg = _to_int(detector.get("wg")) or 0
+        max_value = _to_int(detector.get("max")) or 0
+        if max_value <= 0:
+            if wg and self._scores_enabled:
+                logger.warning("模板 %s 的 %s 检测器未配置 max，得分计算时忽略该项", self.template_id, detector_name)
+            return 0, 1
+        return wg, max_value
+
     def _parse_levels(self, level_element: ET.Element) -> list[dict]:
         """解析 level 节点。"""
         if level_element is None:
@@ -58,92 +172,94 @@ class Template:
         levels = []
         for level_elem in level_element.findall('level'):
             levels.append({
-                "out": level_elem.attrib.get('out'),
-                "subout": level_elem.attrib.get('subout'),
+                "out": _to_int(level_elem.attrib.get('out')),
+                "subout": _to_int(level_elem.attrib.get('subout')),
                 "min": int(level_elem.find('min').text),
                 "max": int(level_elem.find('max').text)
             })
         return levels
 
-    def _check_bad_level(self, detector_name: str, value: int) -> int | None:
-        """检查值是否符合 badLevel 规则。"""
-        detector = self._detectors.get(detector_name)
-        if not detector:
+    def _check_bad_level(self, detector_index: int, value: int) -> int | None:
+        """检查值是否符合 badLevel 规则，detector_index 为 WEIGHT_IDX 或 WATER_IDX。"""
+        lookup = self._bad_lookups[detector_index]
+        if lookup is None:
             return None
-        for level in detector["badLevel"]:
-            if int(level["min"]) <= value <= int(level["max"]):
-                return int(level["out"])
-        return None
+        level = _find_level(lookup, value)
+        return level["out"] if level is not None else None
 
-    def _get_channel_from_level(self, level: dict) -> int:
+    @staticmethod
+    def _pick_by_parity(out: int, subout: int | None) -> int | None:
         """根据当前时间（奇偶秒）返回 out 或 subout。"""
-        current_second = datetime.now().second
-        if current_second % 2 == 0:
-            return int(level["out"])
+        # 时区偏移为整分钟，unix秒的奇偶与本地时间秒数一致；整数纳秒计算，不经过float和datetime
+        if not (time_ns() // 1_000_000_000) & 1:
+            return out
         else:
-            return int(level["subout"])
+            return subout
 
     def get_channel(self, weight_value: int, water_value: int) -> int | None:
         """
         根据传入的 weight 和 water 值筛选通道。
         """
+        if logger.isEnabledFor(logging.DEBUG):
+            # 调试时不走缓存，每次都输出筛选过程
+            levels = self._match_levels(weight_value, water_value, True)
+        else:
+            levels = self._match_levels_cached(weight_value, water_value, False)
+        if levels is None:
+            return None
+        return self._pick_by_parity(*levels)
+
+    def _match_levels(self, weight_value: int, water_value: int, debug: bool) -> tuple | None:
+        """按规则匹配，返回 (out, subout)；badLevel 只有 out，返回 (out, out)；都不匹配时返回 None。"""
         # 1. 筛选最高优先级：badLevel
-        bad_channel = self._check_bad_level("weight", weight_value)
+        bad_channel = self._check_bad_level(WEIGHT_IDX, weight_value)
         if bad_channel is not None:
-            print("weight 命中 badLevel 规则")
-            return bad_channel
+            if debug:
+                logger.debug("weight 命中 badLevel 规则")
+            return bad_channel, bad_channel
 
-        bad_channel = self._check_bad_level("water", water_value)
+        bad_channel = self._check_bad_level(WATER_IDX, water_value)
         if bad_channel is not None:
-            print("water 命中 badLevel 规则")
-            return bad_channel
+            if debug:
+                logger.debug("water 命中 badLevel 规则")
+            return bad_channel, bad_channel
+
+        # 2/3. 按模板形态在解析时选定的筛选方法
+        return self._select_channel(weight_value, water_value, debug)
+
+    def _channel_by_scores(self, weight_value: int, water_value: int, debug: bool) -> tuple | None:
+        """scores 为 enable 时使用得分筛选法。"""
+        if debug:
+            logger.debug("权重规则")
+        # 分数 = wg_weight*weight/weight_max + wg_water*water/water_max，两边同乘 weight_max*water_max，
+        # 与解析时放大的阈值比较，不做除法
+        num = (self._wg_weight * weight_value * self._water_max) + (self._wg_water * water_value * self._weight_max)
+
+        # 根据分数确定 level，并返回对应的 out 和 subout
+        for out, subout, threshold in self._score_thresholds_scaled:
+            if num >= threshold:
+                if debug:
+                    logger.debug("命中 score 规则，分数为 %s，匹配值为 %s", num / self._denom, threshold // self._denom)
+                return out, subout
+        return None
 
-        # 2. 如果 scores 为 enable，则使用得分筛选法
-        if self._scores_enabled:
-            print(f"权重规则")
-            # 获取权重和最大值
-            wg_weight_str = self._detectors.get("weight", {}).get("wg", "0")
-            wg_water_str = self._detectors.get("water", {}).get("wg", "0")
-            wg_weight = int(wg_weight_str) if wg_water_str else 0
-            wg_water = int(wg_water_str) if wg_water_str else 0
-
-            # 找到 goodLevel 的最大值作为分母
-            weight_max_str = self._detectors.get("weight", {}).get("max", 0)
-            weight_max = int(weight_max_str) if weight_max_str else 0
-            water_max_str = self._detectors.get("water", {}).get("max", 0)
-            water_max = int(water_max_str) if weight_max_str else 0
-
-            # 计算分数
-            score = (wg_weight * weight_value / weight_max) + (wg_water * water_value / water_max)
-
-            # 根据分数确定 level，并返回对应的 out 或 subout
-            for _, _, s_score in sorted(self._scores_config, key=lambda x: x[2], reverse=True):
-                if score >= s_score:
-                    # 找到对应的 out/subout
-                    for out, subout, score_val in self._scores_config:
-                        if score_val == s_score:
-                            print(f"命中 score 规则，分数为 {score}，匹配值为 {s_score}")
-                            return self._get_channel_from_level({"out": out, "subout": subout})
-
-
-        # 3. 如果 scores 为 disable，则使用权重为100的检测器
-        else:
-            dominant_detector_name = None
-            for name, detector in self._detectors.items():
-                if detector.get("wg") == "100":
-                    dominant_detector_name = name
-                    break
-            print(f"规则 {dominant_detector_name}, weight {weight_value}, water {water_value}")
-            if dominant_detector_name:
-                dominant_value = weight_value if dominant_detector_name == "weight" else water_value
-                detector = self._detectors[dominant_detector_name]
-                print(f"规则 {dominant_detector_name} 判定值 {dominant_value}")
-                for level in detector["goodLevel"]:
-                    if level["min"] <= dominant_value <= level["max"]:
-                        print(f"命中 {dominant_detector_name} goodLevel 规则")
-                        return self._get_channel_from_level(level)
-
-        # 4. 如果所有规则都不匹配
+    def _channel_by_dominant(self, weight_value: int, water_value: int, debug: bool) -> tuple | None:
+        """scores 为 disable 时使用权重为100的检测器。"""
+        dominant_detector_name, detector_index, good_lookup = self._dominant
+        dominant_value = water_value if detector_index else weight_value
+        if debug:
+            logger.debug("规则 %s, weight %s, water %s", dominant_detector_name, weight_value, water_value)
+            logger.debug("规则 %s 判定值 %s", dominant_detector_name, dominant_value)
+        level = _find_level(good_lookup, dominant_value)
+        if level is not None:
+            if debug:
+                logger.debug("命中 %s goodLevel 规则", dominant_detector_name)
+            return level["out"], level["subout"]
+        return None
+
+    @staticmethod
+    def _no_channel(weight_value: int, water_value: int, debug: bool) -> None:
+        """scores 为 disable 且没有权重为100的检测器时，没有可匹配的规则。"""
         return None
 
 
@@ -152,6 +268,8 @@ class TemplateManager:
     管理所有模板，并提供获取接口。
     """
 
+    __slots__ = ("config_manager", "_templates")
+
     def __init__(self, config_manager: ConfigManager):
         self.config_manager = config_manager
         self._templates: Dict[str, Template] = {}
@@ -161,11 +279,11 @@ class TemplateManager:
         """
         从配置文件中加载所有模板，并初始化为Template实例。
         """
-        print("开始加载所有模板到内存...")
+        logger.info("开始加载所有模板到内存...")
         templates_elements = self.config_manager.get_templates_elements()
         for template_id, element in templates_elements.items():
             self._templates[template_id] = Template(element)
-        print(f"共加载 {len(self._templates)} 个模板。")
+        logger.info("共加载 %d 个模板。", len(self._templates))
 
     def get_template(self, template_id: str) -> Template | None:
         """